@@ -1,42 +1,171 @@
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+
+from nonebot import get_driver
+from nonebot.adapters import Bot
 from nonebot.permission import SUPERUSER
 from nonebot.plugin import PluginMetadata
 from nonebot_plugin_alconna import (
     Alconna,
     Args,
+    Arparma,
     Match,
     Option,
     Subcommand,
+    UniMessage,
     on_alconna,
 )
 from nonebot_plugin_session import EventSession
 
-from zhenxun.configs.utils import PluginExtraData
+from zhenxun.configs.utils import PluginExtraData, RegisterConfig
 from zhenxun.services.log import logger
 from zhenxun.utils.enum import PluginType
 from zhenxun.utils.message import MessageUtils
 
+from .config import get_config
 from .data_source import StoreManager
+from .http_client import StoreHttp
+from .jobs import InstallJob, JobQueue, ProgressCallback
+from .models import PluginFilter
+from .render import RenderPool
 
 __plugin_meta__ = PluginMetadata(
     name="Nonebot插件商店",
     description="Nonebot插件商店",
     usage="""
-    使用参数 -o 指定排序字段
+    使用参数 -o 指定排序字段, 使用 --text / --markdown 以文本形式输出列表
+    筛选参数: --tag 标签 --author 作者 --official --valid
+             --installed/--uninstalled --outdated --since/--until YYYY-MM-DD
     nb商店 ?页码 ?每页项数 <-o> xx : 查看当前的nonebot 插件商店.
     添加nb插件 name/pypi_name     : 添加nonebot 市场插件
-    移除nb插件 name/pypi_name     : 移除nonebot 市场插件
+    移除nb插件 name/pypi_name <--prune> : 移除nonebot 市场插件, --prune 卸载孤立依赖
     搜索nb插件 <任意关键字>  ?页码 ?每页项数 <-o> xx     : 搜索nonebot 市场插件.
     更新nb插件 name/pypi_name     : 更新nonebot 市场插件
     查看可更新nb插件 ?页码 ?每页项数 <-o> xx : 查看可更新nonebot 市场插件.
     更新全部nb插件          : 更新全部nonebot 市场插件
+    nb商店 jobs             : 查看安装任务队列
+    nb商店 cancel 任务id     : 取消排队中或运行中的安装任务
+    nb商店 deps [包名]       : 查询依赖该包的已安装插件
+    nb商店 export ?路径      : 导出已安装插件的锁文件
+    nb商店 import ?路径      : 按锁文件批量安装插件
+    nb商店 plan             : 预览更新全部插件的下载大小与依赖变化
+    nb商店 verify ?name/pypi_name <--repair> : 校验插件文件完整性, --repair 恢复异常文件
+    回滚nb插件 name/pypi_name     : 回滚 nonebot 市场插件至更新前的版本
+    nb商店 stats            : 查看HTTP连接池统计
     """.strip(),
     extra=PluginExtraData(
         author="molanp",
         version="1.2",
         plugin_type=PluginType.SUPERUSER,
+        configs=[
+            RegisterConfig(
+                key="RENDER_MODE",
+                value="image",
+                help="插件列表输出模式 image/text/markdown",
+                default_value="image",
+                type=str,
+            ),
+            RegisterConfig(
+                key="RENDER_WORKERS",
+                value=1,
+                help="渲染插件列表图片的进程数，为0时在bot进程内渲染，重启后生效",
+                default_value=1,
+                type=int,
+            ),
+            RegisterConfig(
+                key="HTTP_MAX_CONNECTIONS",
+                value=20,
+                help="HTTP连接池最大连接数，重启后生效",
+                default_value=20,
+                type=int,
+            ),
+            RegisterConfig(
+                key="HTTP_MAX_CONNECTIONS_PER_HOST",
+                value=6,
+                help="对单个主机的最大并发连接数，重启后生效",
+                default_value=6,
+                type=int,
+            ),
+            RegisterConfig(
+                key="HTTP_MAX_INDEX_REQUESTS_PER_HOST",
+                value=32,
+                help="对单个主机的索引页面、元数据与HEAD等小请求的最大并发数，重启后生效",
+                default_value=32,
+                type=int,
+            ),
+            RegisterConfig(
+                key="MIRRORS",
+                value=[],
+                help="pip simple索引镜像列表，为空时使用pip配置的索引与pypi官方源",
+                default_value=[],
+                type=list[str],
+            ),
+            RegisterConfig(
+                key="MIRROR_HEDGE_DELAY",
+                value=1.0,
+                help="索引页面请求超过该时间(秒)未响应时向下一个镜像发起请求",
+                default_value=1.0,
+                type=float,
+            ),
+            RegisterConfig(
+                key="WHEEL_HEDGE_DELAY",
+                value=5.0,
+                help="安装包下载超过该时间(秒)未完成时向下一个镜像发起下载",
+                default_value=5.0,
+                type=float,
+            ),
+            RegisterConfig(
+                key="SHARED_CACHE_PATH",
+                value="",
+                help="多个bot实例共享的缓存目录，用于插件列表、索引页面与安装包，为空时不启用",
+                default_value="",
+                type=str,
+            ),
+            RegisterConfig(
+                key="SNAPSHOT_RETENTION",
+                value=3,
+                help="更新插件前保留的快照数量，用于回滚，为0时不创建快照",
+                default_value=3,
+                type=int,
+            ),
+            RegisterConfig(
+                key="JOB_WORKERS",
+                value=1,
+                help="同时执行的安装任务数，大于1时多个pip进程可能同时运行，重启后生效",
+                default_value=1,
+                type=int,
+            ),
+            RegisterConfig(
+                key="HOT_LOAD",
+                value=False,
+                help="安装新插件后立即热加载，命令可立即使用（启动钩子不会执行、不会注册到插件管理，已导入过的插件仍需重启）",
+                default_value=False,
+                type=bool,
+            ),
+        ],
     ).to_dict(),
 )
 
+driver = get_driver()
+
+
+@driver.on_startup
+async def _():
+    await RenderPool.start(get_config("RENDER_WORKERS", 1))
+
+
+@driver.on_bot_connect
+async def _():
+    StoreManager.start_warm_up()
+
+
+@driver.on_shutdown
+async def _():
+    RenderPool.shutdown()
+    await JobQueue.shutdown()
+    await StoreHttp.close()
+
+
 _matcher = on_alconna(
     Alconna(
         "nb商店",
@@ -46,12 +175,40 @@ _matcher = on_alconna(
             Args["order_by", str, "time"],
             help_text="排序标准，默认为更新时间",
         ),
+        Option("--text", help_text="以文本形式输出列表"),
+        Option("--markdown", help_text="以markdown形式输出列表"),
+        Option("--tag", Args["tag", str], help_text="按标签筛选，多个标签用逗号分隔"),
+        Option("--official", help_text="仅显示官方插件"),
+        Option("--valid", help_text="仅显示通过商店测试的插件"),
+        Option("--author", Args["author", str], help_text="按作者筛选"),
+        Option("--installed", help_text="仅显示已安装的插件"),
+        Option("--uninstalled", help_text="仅显示未安装的插件"),
+        Option("--outdated", help_text="仅显示可更新的插件"),
+        Option("--since", Args["since", str], help_text="更新时间不早于 YYYY-MM-DD"),
+        Option("--until", Args["until", str], help_text="更新时间不晚于 YYYY-MM-DD"),
         Subcommand("add", Args["plugin_id", str]),
-        Subcommand("remove", Args["plugin_id", str]),
+        Subcommand(
+            "remove",
+            Args["plugin_id", str],
+            Option("--prune", help_text="一并卸载不再被需要的依赖"),
+        ),
+        Subcommand("deps", Args["dist", str]),
         Subcommand("search", Args["plugin_name_or_author", str]),
         Subcommand("update", Args["plugin_id", str]),
         Subcommand("can_update"),
         Subcommand("update_all"),
+        Subcommand("plan"),
+        Subcommand("export", Args["path?", str]),
+        Subcommand("import", Args["path?", str]),
+        Subcommand("jobs"),
+        Subcommand("cancel", Args["job_id", int]),
+        Subcommand(
+            "verify",
+            Args["plugin_id?", str],
+            Option("--repair", help_text="从缓存的安装包中恢复缺失与被修改的文件"),
+        ),
+        Subcommand("stats"),
+        Subcommand("rollback", Args["plugin_id", str]),
     ),
     permission=SUPERUSER,
     priority=1,
@@ -93,6 +250,13 @@ _matcher.shortcut(
     prefix=True,
 )
 
+_matcher.shortcut(
+    r"回滚nb插件",
+    command="nb商店",
+    arguments=["rollback", "{%0}"],
+    prefix=True,
+)
+
 _matcher.shortcut(
     r"更新全部nb插件",
     command="nb商店",
@@ -101,9 +265,51 @@ _matcher.shortcut(
 )
 
 
+def _render_mode(arparma: Arparma) -> str | None:
+    """从命令参数中获取输出模式"""
+    if arparma.find("text"):
+        return "text"
+    if arparma.find("markdown"):
+        return "markdown"
+    return None
+
+
+def _parse_time(value: str) -> datetime:
+    """解析时间参数，未指定时区时按UTC处理，与商店数据的时间一致"""
+    result = datetime.fromisoformat(value)
+    return result if result.tzinfo else result.replace(tzinfo=timezone.utc)
+
+
+def _build_filter(arparma: Arparma) -> PluginFilter | None:
+    """从命令参数中构建筛选条件"""
+    args = arparma.all_matched_args
+    filters = PluginFilter(
+        tags=[t.strip() for t in args.get("tag", "").split(",") if t.strip()],
+        official=bool(arparma.find("official")),
+        valid=bool(arparma.find("valid")),
+        author=args.get("author"),
+        outdated=bool(arparma.find("outdated")),
+    )
+    if arparma.find("installed"):
+        filters.installed = True
+    elif arparma.find("uninstalled"):
+        filters.installed = False
+    if since := args.get("since"):
+        filters.since = _parse_time(since)
+    if until := args.get("until"):
+        filters.until = _parse_time(until)
+        if len(until) <= 10:
+            # 仅指定日期时包含当天
+            filters.until += timedelta(days=1)
+    if filters == PluginFilter():
+        return None
+    return filters
+
+
 @_matcher.assign("$main")
 async def _(
     session: EventSession,
+    arparma: Arparma,
     page: Match[int],
     page_size: Match[int],
     order_by: Match[str],
@@ -111,7 +317,11 @@ async def _(
     _order_by = order_by.result if order_by.available else "time"
     try:
         result = await StoreManager.get_plugins_by_page(
-            page.result, page_size.result, _order_by
+            page.result,
+            page_size.result,
+            _order_by,
+            mode=_render_mode(arparma),
+            filters=_build_filter(arparma),
         )
         logger.info(
             f"查看插件列表 orber_by: {_order_by}",
@@ -124,32 +334,49 @@ async def _(
         await MessageUtils.build_message("获取插件列表失败...").send()
 
 
+def _submit_job(
+    bot: Bot, title: str, func: Callable[[ProgressCallback], Awaitable[str]]
+) -> InstallJob:
+    """提交安装任务，进度与结果发送给命令发起者"""
+    target = UniMessage.get_target()
+
+    async def notify(message: str):
+        await MessageUtils.build_message(message).send(target=target, bot=bot)
+
+    return JobQueue.submit(title, func, notify, get_config("JOB_WORKERS", 1))
+
+
 @_matcher.assign("add")
-async def _(session: EventSession, plugin_id: str):
-    try:
-        await MessageUtils.build_message(f"正在添加插件: {plugin_id}").send()
-        result = await StoreManager.add_plugin(plugin_id)
-    except Exception as e:
-        logger.error(f"添加插件 {plugin_id}失败", "nb商店", session=session, e=e)
-        await MessageUtils.build_message(f"添加插件 {plugin_id} 失败 e: {e}").finish()
-    logger.info(f"添加插件 {plugin_id}", "nb商店", session=session)
-    await MessageUtils.build_message(result).send()
+async def _(session: EventSession, bot: Bot, plugin_id: str):
+    job = _submit_job(
+        bot,
+        f"添加插件 {plugin_id}",
+        lambda progress: StoreManager.add_plugin(plugin_id, progress),
+    )
+    logger.info(f"添加插件 {plugin_id} 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(
+        f"正在添加插件: {plugin_id}, 任务id: {job.id}"
+    ).send()
 
 
 @_matcher.assign("remove")
-async def _(session: EventSession, plugin_id: str):
-    try:
-        result = await StoreManager.remove_plugin(plugin_id)
-    except Exception as e:
-        logger.error(f"移除插件 {plugin_id}失败", "nb商店", session=session, e=e)
-        await MessageUtils.build_message(f"移除插件 {plugin_id} 失败 e: {e}").finish()
-    logger.info(f"移除插件 {plugin_id}", "nb商店", session=session)
-    await MessageUtils.build_message(result).send()
+async def _(session: EventSession, bot: Bot, arparma: Arparma, plugin_id: str):
+    prune = bool(arparma.find("remove.prune"))
+    job = _submit_job(
+        bot,
+        f"移除插件 {plugin_id}",
+        lambda _: StoreManager.remove_plugin(plugin_id, prune),
+    )
+    logger.info(f"移除插件 {plugin_id} 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(
+        f"正在移除插件: {plugin_id}, 任务id: {job.id}"
+    ).send()
 
 
 @_matcher.assign("search")
 async def _(
     session: EventSession,
+    arparma: Arparma,
     plugin_name_or_author: str,
     page: Match[int],
     page_size: Match[int],
@@ -158,7 +385,12 @@ async def _(
     _order_by = order_by.result if order_by.available else "time"
     try:
         result = await StoreManager.get_plugins_by_page(
-            page.result, page_size.result, _order_by, query=plugin_name_or_author
+            page.result,
+            page_size.result,
+            _order_by,
+            query=plugin_name_or_author,
+            mode=_render_mode(arparma),
+            filters=_build_filter(arparma),
         )
     except Exception as e:
         logger.error(
@@ -175,20 +407,22 @@ async def _(
 
 
 @_matcher.assign("update")
-async def _(session: EventSession, plugin_id: str):
-    try:
-        await MessageUtils.build_message(f"正在更新插件 {plugin_id}").send()
-        result = await StoreManager.update_plugin(plugin_id)
-    except Exception as e:
-        logger.error(f"更新插件 {plugin_id}失败", "nb商店", session=session, e=e)
-        await MessageUtils.build_message(f"更新插件 {plugin_id} 失败 e: {e}").finish()
-    logger.info(f"更新插件 {plugin_id}", "nb商店", session=session)
-    await MessageUtils.build_message(result).send()
+async def _(session: EventSession, bot: Bot, plugin_id: str):
+    job = _submit_job(
+        bot,
+        f"更新插件 {plugin_id}",
+        lambda progress: StoreManager.update_plugin(plugin_id, progress),
+    )
+    logger.info(f"更新插件 {plugin_id} 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(
+        f"正在更新插件 {plugin_id}, 任务id: {job.id}"
+    ).send()
 
 
 @_matcher.assign("can_update")
 async def _(
     session: EventSession,
+    arparma: Arparma,
     page: Match[int],
     page_size: Match[int],
     order_by: Match[str],
@@ -196,7 +430,12 @@ async def _(
     _order_by = order_by.result if order_by.available else "time"
     try:
         result = await StoreManager.get_plugins_by_page(
-            page.result, page_size.result, _order_by, True
+            page.result,
+            page_size.result,
+            _order_by,
+            True,
+            mode=_render_mode(arparma),
+            filters=_build_filter(arparma),
         )
     except Exception as e:
         logger.error("查看可更新插件失败", "nb商店", session=session, e=e)
@@ -206,12 +445,112 @@ async def _(
 
 
 @_matcher.assign("update_all")
+async def _(session: EventSession, bot: Bot):
+    job = _submit_job(bot, "更新全部插件", StoreManager.update_all_plugin)
+    logger.info(f"更新全部插件 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(f"正在更新全部插件, 任务id: {job.id}").send()
+
+
+@_matcher.assign("deps")
+async def _(session: EventSession, dist: str):
+    try:
+        result = await StoreManager.dist_dependents(dist)
+    except Exception as e:
+        logger.error(f"查询依赖 {dist} 失败", "nb商店", session=session, e=e)
+        await MessageUtils.build_message(f"查询依赖 {dist} 失败 e: {e}").finish()
+    logger.info(f"查询依赖 {dist}", "nb商店", session=session)
+    await MessageUtils.build_message(result).send()
+
+
+@_matcher.assign("export")
+async def _(session: EventSession, path: Match[str]):
+    _path = path.result if path.available else None
+    try:
+        result = await StoreManager.export_lockfile(_path)
+    except Exception as e:
+        logger.error("导出锁文件失败", "nb商店", session=session, e=e)
+        await MessageUtils.build_message(f"导出锁文件失败 e: {e}").finish()
+    logger.info("导出锁文件", "nb商店", session=session)
+    await MessageUtils.build_message(result).send()
+
+
+@_matcher.assign("import")
+async def _(session: EventSession, bot: Bot, path: Match[str]):
+    _path = path.result if path.available else None
+    job = _submit_job(
+        bot,
+        "按锁文件安装插件",
+        lambda progress: StoreManager.import_lockfile(_path, progress),
+    )
+    logger.info(f"按锁文件安装插件 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(f"正在按锁文件安装插件, 任务id: {job.id}").send()
+
+
+@_matcher.assign("jobs")
+async def _(session: EventSession):
+    logger.info("查看安装任务", "nb商店", session=session)
+    await MessageUtils.build_message(JobQueue.summary()).send()
+
+
+@_matcher.assign("cancel")
+async def _(session: EventSession, job_id: int):
+    result = JobQueue.cancel(job_id)
+    logger.info(f"取消安装任务 {job_id}", "nb商店", session=session)
+    await MessageUtils.build_message(result).send()
+
+
+@_matcher.assign("plan")
 async def _(session: EventSession):
     try:
-        await MessageUtils.build_message("正在更新全部插件").send()
-        result = await StoreManager.update_all_plugin()
+        result = await StoreManager.plan_update()
+    except Exception as e:
+        logger.error("生成更新计划失败", "nb商店", session=session, e=e)
+        await MessageUtils.build_message(f"生成更新计划失败 e: {e}").finish()
+    logger.info("查看更新计划", "nb商店", session=session)
+    await MessageUtils.build_message(result).send()
+
+
+@_matcher.assign("verify")
+async def _(session: EventSession, bot: Bot, arparma: Arparma, plugin_id: Match[str]):
+    _plugin_id = plugin_id.result if plugin_id.available else None
+    if arparma.find("verify.repair"):
+        # 恢复文件会修改插件目录，与安装/更新任务排队执行
+        job = _submit_job(
+            bot,
+            f"恢复插件 {_plugin_id or '全部'}",
+            lambda _: StoreManager.verify_plugin(_plugin_id, True),
+        )
+        logger.info(
+            f"恢复插件 {_plugin_id or '全部'} 任务id: {job.id}",
+            "nb商店",
+            session=session,
+        )
+        await MessageUtils.build_message(
+            f"正在校验并恢复插件, 任务id: {job.id}"
+        ).finish()
+    try:
+        result = await StoreManager.verify_plugin(_plugin_id)
     except Exception as e:
-        logger.error("更新全部插件失败", "nb商店", session=session, e=e)
-        await MessageUtils.build_message(f"更新全部插件失败 e: {e}").finish()
-    logger.info("更新全部插件", "nb商店", session=session)
+        logger.error("校验插件失败", "nb商店", session=session, e=e)
+        await MessageUtils.build_message(f"校验插件失败 e: {e}").finish()
+    logger.info(f"校验插件 {_plugin_id or '全部'}", "nb商店", session=session)
     await MessageUtils.build_message(result).send()
+
+
+@_matcher.assign("rollback")
+async def _(session: EventSession, bot: Bot, plugin_id: str):
+    job = _submit_job(
+        bot,
+        f"回滚插件 {plugin_id}",
+        lambda _: StoreManager.rollback_plugin(plugin_id),
+    )
+    logger.info(f"回滚插件 {plugin_id} 任务id: {job.id}", "nb商店", session=session)
+    await MessageUtils.build_message(
+        f"正在回滚插件: {plugin_id}, 任务id: {job.id}"
+    ).send()
+
+
+@_matcher.assign("stats")
+async def _(session: EventSession):
+    logger.info("查看HTTP连接池统计", "nb商店", session=session)
+    await MessageUtils.build_message(StoreHttp.get_stats()).send()
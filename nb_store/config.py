@@ -1,4 +1,7 @@
 from pathlib import Path
+from typing import Any
+
+from zhenxun.configs.config import Config
 
 PLUGIN_FLODER = Path() / "nonebot_plugins"
 PLUGIN_FLODER.mkdir(parents=True, exist_ok=True)
@@ -6,4 +9,40 @@ PLUGIN_FLODER.mkdir(parents=True, exist_ok=True)
 PLUGIN_INDEX = "https://registry.nonebot.dev/plugins.json"
 """nb插件列表"""
 
+PYPI_SIMPLE_URL = "https://pypi.org/simple/"
+"""pypi官方simple索引"""
+
 LOG_COMMAND = "nb商店"
+
+CONFIG_MODULE = "nb_store"
+
+SLOW_LOAD_THRESHOLD = 1.0
+"""插件加载耗时超过该值(秒)时发出警告"""
+
+MIRROR_EWMA_ALPHA = 0.3
+"""镜像延迟与错误率统计的平滑系数"""
+MIRROR_FAILURE_THRESHOLD = 3
+"""镜像连续失败该次数后熔断"""
+MIRROR_COOLDOWN = 60
+"""镜像熔断时长(秒)"""
+
+SHARED_CACHE_LOCK_TIMEOUT = 300
+"""共享缓存锁超过该时长(秒)未释放时视为失效"""
+REGISTRY_CACHE_TTL = 60
+"""插件列表缓存有效期(秒)"""
+SIMPLE_CACHE_TTL = 300
+"""simple索引页面缓存有效期(秒)"""
+WHEEL_CACHE_MAX_AGE = 7 * 24 * 3600
+"""共享缓存中超过该时长(秒)未被使用的安装包会被清理"""
+WHEEL_CACHE_EVICT_INTERVAL = 3600
+"""清理共享缓存安装包的最小间隔(秒)"""
+
+JOB_PROGRESS_INTERVAL = 5
+"""安装任务进度消息的最小发送间隔(秒)"""
+JOB_HISTORY_SIZE = 20
+"""保留的已结束安装任务数量"""
+
+
+def get_config(key: str, default: Any = None) -> Any:
+    """获取插件配置项"""
+    return Config.get_config(CONFIG_MODULE, key, default)
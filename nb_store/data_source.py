@@ -1,28 +1,94 @@
+import asyncio
+from collections.abc import Awaitable, Callable
 import math
+import os
 from pathlib import Path
+import pkgutil
+import tempfile
+import time
 
-from aiocache import cached
+import aiofiles
 import nonebot
+from nonebot.compat import model_dump
 import ujson
 
 from zhenxun.models.plugin_info import PluginInfo
 from zhenxun.services.log import logger
-from zhenxun.utils.http_utils import AsyncHttpx
-from zhenxun.utils.image_utils import BuildImage, ImageTemplate, RowStyle
+from zhenxun.utils.image_utils import BuildImage
 from zhenxun.utils.manager.virtual_env_package_manager import VirtualEnvPackageManager
 
-from .config import LOG_COMMAND, PLUGIN_FLODER, PLUGIN_INDEX
-from .models import StorePluginInfo
+from .config import (
+    LOG_COMMAND,
+    PLUGIN_FLODER,
+    PLUGIN_INDEX,
+    REGISTRY_CACHE_TTL,
+    SLOW_LOAD_THRESHOLD,
+    get_config,
+)
+from .deps import DependencyIndex, normalize
+from .facets import FacetIndex
+from .fuzzy import FuzzyIndex
+from .http_client import StoreHttp
+from .integrity import (
+    format_results,
+    list_records,
+    load_record,
+    prune_wheels,
+    remove_record,
+    repair_plugin,
+    save_record,
+    verify_plugins,
+    write_record,
+)
+from .jobs import JobQueue, ProgressCallback, finish_before_cancel
+from .lockfile import (
+    LOCKFILE_PATH,
+    LockedPlugin,
+    fetch_locked_wheels,
+    lock_entry,
+    read_lockfile,
+    write_lockfile,
+)
+from .mirror import download_whl
+from .models import PluginFilter, StorePluginInfo
+from .plan import build_update_plan
+from .render import RENDER_MODES, RenderPool, render_text
+from .shared_cache import SharedCache
+from .snapshot import restore_snapshot, take_snapshot
 from .utils import (
     Plugin,
+    compile_plugin,
     copy2,
-    get_whl_download_url,
+    get_whl_filename,
+    hot_load_plugin,
     init_ver_data,
     path_mkdir,
     path_rm,
 )
 
-nonebot.load_plugins(str(PLUGIN_FLODER))
+
+def load_store_plugins():
+    """逐个加载商店插件并记录每个插件的加载耗时"""
+    cost: dict[str, float] = {}
+    for module_info in pkgutil.iter_modules([str(PLUGIN_FLODER)]):
+        if module_info.name.startswith("_"):
+            continue
+        start = time.perf_counter()
+        nonebot.load_plugin(PLUGIN_FLODER / module_info.name)
+        cost[module_info.name] = time.perf_counter() - start
+    for module, seconds in sorted(cost.items(), key=lambda x: x[1], reverse=True):
+        if seconds >= SLOW_LOAD_THRESHOLD:
+            logger.warning(f"加载插件 {module} 耗时较长: {seconds:.3f}s", LOG_COMMAND)
+        else:
+            logger.debug(f"加载插件 {module} 耗时 {seconds:.3f}s", LOG_COMMAND)
+    if cost:
+        logger.info(
+            f"共加载 {len(cost)} 个nb商店插件，耗时 {sum(cost.values()):.3f}s",
+            LOG_COMMAND,
+        )
+
+
+load_store_plugins()
 
 
 def sort_plugins_by(
@@ -36,45 +102,159 @@ def sort_plugins_by(
     )
 
 
-async def common_install_plugin(plugin_info: StorePluginInfo):
-    """通用插件安装流程"""
-    down_url = await get_whl_download_url(plugin_info.project_link)
-    if not down_url:
+async def common_install_plugin(
+    plugin_info: StorePluginInfo, progress: ProgressCallback | None = None
+):
+    """通用插件安装流程
+
+    参数:
+        plugin_info: 插件信息
+        progress: 进度回调
+    """
+
+    async def report(message: str):
+        if progress:
+            await progress(f"{plugin_info.name}: {message}")
+
+    async def on_download(received: int, total: int | None):
+        size = f"{received / 1024:.0f}"
+        if total:
+            size += f"/{total / 1024:.0f}"
+        await report(f"正在下载安装包 {size} KB")
+
+    async def on_extract(current: int, total: int):
+        await report(f"正在解压文件 {current}/{total}")
+
+    await report("正在解析安装包")
+    whl = await download_whl(plugin_info.project_link, progress=on_download)
+    if not whl:
         raise FileNotFoundError(f"插件 {plugin_info.name} 未找到安装包...")
-    target_path = PLUGIN_FLODER / plugin_info.module_name
-    whl_data = await AsyncHttpx.get(down_url)
-    await path_rm(target_path)
-    path_mkdir(target_path)
-    await copy2(whl_data.content, target_path)
-    await Plugin(plugin_info).set_local_ver(plugin_info.version)
-    await install_requirement(target_path / "requirements.txt")
+    down_url, whl_data = whl
+    logger.debug(f"插件 {plugin_info.name} 安装包: {down_url}", LOG_COMMAND)
+    async with JobQueue.module_lock(plugin_info.module_name):
+        target_path = await extract_plugin(
+            plugin_info,
+            get_whl_filename(down_url),
+            whl_data,
+            plugin_info.version,
+            on_extract,
+        )
+        await report("正在安装依赖")
+        await install_requirement(target_path / "requirements.txt")
+    await report("依赖安装完成")
 
 
-def row_style(column: str, text: str) -> RowStyle:
-    """文本风格
+async def extract_plugin(
+    plugin_info: StorePluginInfo,
+    whl_filename: str,
+    whl_data: bytes,
+    version: str,
+    progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> Path:
+    """将安装包解压至插件目录，不安装依赖
 
     参数:
-        column: 表头
-        text: 文本内容
+        plugin_info: 插件信息
+        whl_filename: 安装包文件名
+        whl_data: 安装包内容
+        version: 安装的版本号
+        progress: 解压进度回调
 
     返回:
-        RowStyle: RowStyle
+        Path: 插件目录
     """
-    style = RowStyle()
-    if column == "-" and text == "已安装":
-        style.font_color = "#67C23A"
-    if column == "商店测试":
-        style.font_color = "#67C23A" if text == "True" else "#F56C6C"
-    return style
+    target_path = PLUGIN_FLODER / plugin_info.module_name
+    plugin = Plugin(plugin_info)
+    await init_ver_data()
+    record = load_record(plugin_info.module_name)
+    snapshot = await take_snapshot(
+        plugin_info.module_name,
+        plugin.get_local_ver(),
+        get_config("SNAPSHOT_RETENTION", 3),
+        record,
+    )
+
+    async def replace():
+        try:
+            await path_rm(target_path)
+            path_mkdir(target_path)
+            await copy2(whl_data, target_path, progress)
+            await save_record(plugin_info.module_name, whl_filename, whl_data)
+        except Exception:
+            # 不留下半解压的插件目录
+            if snapshot and await restore_snapshot(plugin_info.module_name):
+                if record:
+                    await write_record(plugin_info.module_name, record)
+                else:
+                    remove_record(plugin_info.module_name)
+            else:
+                await path_rm(target_path)
+                remove_record(plugin_info.module_name)
+                await plugin.remove_local_ver()
+            await prune_wheels()
+            raise
+        # 旧版本的安装包仅在仍被保留的快照引用时保留
+        await prune_wheels()
+        seconds = await compile_plugin(target_path)
+        logger.debug(f"插件 {plugin_info.name} 预编译耗时 {seconds:.3f}s", LOG_COMMAND)
+        await plugin.set_local_ver(version)
+
+    # 从删除旧文件到写入版本号之间不响应任务取消，等待这一步完成后再退出
+    await finish_before_cancel(replace())
+    return target_path
 
 
 async def install_requirement(path: Path):
-    return await VirtualEnvPackageManager.install_requirement(path)
+    # pip进程无法随任务取消而终止，等待其结束后再释放worker
+    return await finish_before_cancel(
+        VirtualEnvPackageManager.install_requirement(path)
+    )
+
+
+async def uninstall_requirements(packages: list[str]):
+    return await finish_before_cancel(VirtualEnvPackageManager.uninstall(packages))
 
 
 class StoreManager:
     # module -> local_version
     suc_plugin: dict[str, str] | None = None
+    facet_index: FacetIndex | None = None
+    fuzzy_index: FuzzyIndex | None = None
+    warm_up_task: asyncio.Task | None = None
+    plugin_data: list[StorePluginInfo] | None = None
+    data_time: float = 0.0
+    refresh_task: asyncio.Task | None = None
+    first_page: tuple[tuple, BuildImage | bytes | str] | None = None
+    """默认首页的渲染结果 (缓存键, 结果)，插件列表刷新时失效"""
+
+    @classmethod
+    def start_warm_up(cls) -> asyncio.Task:
+        """在后台预热插件列表、已安装插件与首次渲染，重复调用时返回同一任务"""
+        if cls.warm_up_task is None:
+            cls.warm_up_task = asyncio.create_task(cls._warm_up())
+        return cls.warm_up_task
+
+    @classmethod
+    async def wait_warm_up(cls):
+        """等待进行中的预热任务，避免命令重复加载数据"""
+        if cls.warm_up_task and not cls.warm_up_task.done():
+            await asyncio.shield(cls.warm_up_task)
+
+    @classmethod
+    async def _warm_up(cls):
+        start = time.perf_counter()
+        try:
+            await cls.get_data()
+            if cls.suc_plugin is None:
+                cls.suc_plugin = await cls.init_suc_plugin()
+            # 与 nb商店 命令的默认参数一致，结果会被缓存供首次命令直接使用
+            await cls._get_plugins_page(1, 20, "time")
+        except Exception as e:
+            logger.warning("nb商店预热失败", LOG_COMMAND, e=e)
+            return
+        logger.info(
+            f"nb商店预热完成, 耗时 {time.perf_counter() - start:.2f}s", LOG_COMMAND
+        )
 
     @classmethod
     async def init_suc_plugin(cls) -> dict[str, str]:
@@ -107,8 +287,45 @@ class StoreManager:
         order_by: str = "time",
         only_show_update: bool = False,
         query: str = "",
-    ) -> BuildImage | str:
+        mode: str | None = None,
+        filters: PluginFilter | None = None,
+    ) -> BuildImage | bytes | str:
+        await cls.wait_warm_up()
+        return await cls._get_plugins_page(
+            page, page_size, order_by, only_show_update, query, mode, filters
+        )
+
+    @classmethod
+    async def _get_plugins_page(
+        cls,
+        page: int = 1,
+        page_size: int = 50,
+        order_by: str = "time",
+        only_show_update: bool = False,
+        query: str = "",
+        mode: str | None = None,
+        filters: PluginFilter | None = None,
+    ) -> BuildImage | bytes | str:
         plugins: list[StorePluginInfo] = await cls.get_data()
+        if cls.suc_plugin is None:
+            cls.suc_plugin = await cls.init_suc_plugin()
+        cache_key = None
+        if page == 1 and not (only_show_update or query or filters):
+            cache_key = (
+                page_size,
+                order_by,
+                mode or get_config("RENDER_MODE", "image"),
+                tuple(sorted(cls.suc_plugin.items())),
+            )
+            if cls.first_page and cls.first_page[0] == cache_key:
+                return cls.first_page[1]
+        if only_show_update:
+            # 不修改调用方传入的筛选条件
+            filters = PluginFilter(
+                **{**(model_dump(filters) if filters else {}), "outdated": True}
+            )
+        if filters:
+            plugins = cls.get_facet_index(plugins).select(filters, cls.suc_plugin)
         if query:
             plugins = [
                 plugin_info
@@ -117,25 +334,20 @@ class StoreManager:
                 or query.lower() in plugin_info.author.lower()
                 or query.lower() in plugin_info.desc.lower()
             ]
-        if cls.suc_plugin is None:
-            cls.suc_plugin = await cls.init_suc_plugin()
-
         plugins = sort_plugins_by(plugins, order_by)
-        if only_show_update:
-            plugins = [
-                plugin
-                for plugin in plugins
-                if plugin.module_name in cls.suc_plugin
-                and cls.suc_plugin[plugin.module_name] != plugin.version
-            ]
         total = math.ceil(len(plugins) / page_size)
         if not 0 < page <= total:
             return "没有更多数据了..."
         start = (page - 1) * page_size
         end = start + page_size
-        return await cls.render_plugins_list(
-            plugins[start:end], f"当前页码 {page}/{total}, 在命令后附加页码进行翻页"
+        result = await cls.render_plugins_list(
+            plugins[start:end],
+            f"当前页码 {page}/{total}, 在命令后附加页码进行翻页",
+            mode,
         )
+        if cache_key:
+            cls.first_page = (cache_key, result)
+        return result
 
     @classmethod
     async def get_nb_plugins(cls) -> list[StorePluginInfo]:
@@ -144,29 +356,85 @@ class StoreManager:
         返回:
             list[StorePluginInfo]: 插件列表数据
         """
-        response = await AsyncHttpx.get(PLUGIN_INDEX)
-        if response.status_code == 200:
-            logger.info("获取nb插件列表成功", LOG_COMMAND)
-            data = []
-            data.extend(
-                StorePluginInfo(**detail)
-                for detail in ujson.loads(response.text)
-                if detail.get("type") != "library"
-            )
-            return data
-        else:
+
+        async def fetch() -> bytes | None:
+            response = await StoreHttp.get(PLUGIN_INDEX, "registry")
+            if response.status_code == 200:
+                logger.info("获取nb插件列表成功", LOG_COMMAND)
+                return response.content
             logger.warning(f"获取nb插件列表失败: {response.status_code}", LOG_COMMAND)
-        return []
+            return None
+
+        content = await SharedCache.get_or_fetch(
+            "registry", PLUGIN_INDEX, REGISTRY_CACHE_TTL, fetch
+        )
+        if content is None:
+            return []
+        return [
+            StorePluginInfo(**detail)
+            for detail in ujson.loads(content)
+            if detail.get("type") != "library"
+        ]
 
     @classmethod
-    @cached(60)
     async def get_data(cls) -> list[StorePluginInfo]:
         """获取插件信息数据
 
+        数据过期后仍先返回已有数据，并在后台刷新，避免命令等待下载插件列表；
+        首次加载时并发的调用共用同一个加载任务
+
         返回:
             list[StorePluginInfo]: 插件信息数据
         """
-        return await cls.get_nb_plugins()
+        refreshing = cls.refresh_task is not None and not cls.refresh_task.done()
+        if cls.plugin_data is None:
+            # 首次加载同一时间只进行一次，其余调用等待同一任务
+            if not refreshing:
+                cls.refresh_task = asyncio.create_task(cls.refresh_data())
+            assert cls.refresh_task
+            await asyncio.shield(cls.refresh_task)
+        elif time.monotonic() - cls.data_time >= REGISTRY_CACHE_TTL and not refreshing:
+            cls.refresh_task = asyncio.create_task(cls.refresh_data())
+        return cls.plugin_data or []
+
+    @classmethod
+    async def refresh_data(cls):
+        """重新获取插件列表，获取失败时保留已有数据"""
+        try:
+            plugins = await cls.get_nb_plugins()
+        except Exception as e:
+            if cls.plugin_data is None:
+                raise
+            logger.warning("刷新nb插件列表失败，继续使用已有数据", LOG_COMMAND, e=e)
+            return
+        cls.data_time = time.monotonic()
+        if not plugins and cls.plugin_data:
+            return
+        cls.build_index(plugins)
+        cls.plugin_data = plugins
+        cls.first_page = None
+
+    @classmethod
+    def build_index(cls, plugins: list[StorePluginInfo]):
+        """为插件列表建立分面索引与容错索引"""
+        cls.facet_index = FacetIndex(plugins)
+        cls.fuzzy_index = FuzzyIndex(plugins)
+
+    @classmethod
+    def get_facet_index(cls, plugins: list[StorePluginInfo]) -> FacetIndex:
+        """获取与插件列表对应的分面索引"""
+        if cls.facet_index is None or cls.facet_index.plugins is not plugins:
+            cls.build_index(plugins)
+        assert cls.facet_index
+        return cls.facet_index
+
+    @classmethod
+    def get_fuzzy_index(cls, plugins: list[StorePluginInfo]) -> FuzzyIndex:
+        """获取与插件列表对应的容错索引"""
+        if cls.fuzzy_index is None or cls.fuzzy_index.plugins is not plugins:
+            cls.build_index(plugins)
+        assert cls.fuzzy_index
+        return cls.fuzzy_index
 
     @classmethod
     def version_check(cls, plugin_info: StorePluginInfo):
@@ -191,7 +459,22 @@ class StoreManager:
         cls,
         plugin_list: list[StorePluginInfo],
         tip: str = "通过添加/移除/更新插件 包名/名称 来管理插件",
-    ) -> BuildImage:
+        mode: str | None = None,
+    ) -> BuildImage | bytes | str:
+        """渲染插件列表
+
+        参数:
+            plugin_list: 插件列表
+            tip: 提示文本
+            mode: 输出模式 image/text/markdown，为空时使用配置 RENDER_MODE
+
+        返回:
+            BuildImage | bytes | str: 图片或文本
+        """
+        mode = mode or get_config("RENDER_MODE", "image")
+        if mode not in RENDER_MODES:
+            logger.warning(f"未知的输出模式 {mode}，使用图片输出", LOG_COMMAND)
+            mode = "image"
         column_name = [
             "-",
             "商店测试",
@@ -218,33 +501,44 @@ class StoreManager:
             ]
             for plugin_info in plugin_list
         ]
-        return await ImageTemplate.table_page(
+        if mode != "image":
+            return render_text(
+                "nb商店插件列表",
+                tip,
+                column_name,
+                data_list,
+                markdown=mode == "markdown",
+            )
+        return await RenderPool.table_page(
             "nb商店插件列表",
             tip,
             column_name,
             data_list,
-            text_style=row_style,
         )
 
     @classmethod
-    async def get_plugins_info(cls) -> BuildImage:
+    async def get_plugins_info(cls) -> BuildImage | bytes | str:
         """插件列表
 
         返回:
-            BuildImage | str: 返回消息
+            BuildImage | bytes | str: 返回消息
         """
         return await cls.render_plugins_list(await cls.get_data())
 
     @classmethod
-    async def add_plugin(cls, plugin_id: str) -> str:
+    async def add_plugin(
+        cls, plugin_id: str, progress: ProgressCallback | None = None
+    ) -> str:
         """添加插件
 
         参数:
             plugin_id: 插件id或模块名
+            progress: 进度回调
 
         返回:
             str: 返回消息
         """
+        await cls.wait_warm_up()
         plugin_list: list[StorePluginInfo] = await cls.get_data()
         try:
             plugin_key = await cls._get_module_by_pypi_id_name(plugin_id)
@@ -261,19 +555,32 @@ class StoreManager:
         if plugin_info.module_name in cls.suc_plugin:
             return f"插件 {plugin_info.name} 已安装，无需重复安装"
         logger.info(f"正在安装插件 {plugin_info.name}...", LOG_COMMAND)
-        await common_install_plugin(plugin_info)
-        return f"插件 {plugin_info.name} 安装成功! 重启后生效"
+        await common_install_plugin(plugin_info, progress)
+        if not get_config("HOT_LOAD", False):
+            return f"插件 {plugin_info.name} 安装成功! 重启后生效"
+        loaded, reason = hot_load_plugin(plugin_info.module_name)
+        if not loaded:
+            return f"插件 {plugin_info.name} 安装成功! {reason}，重启后生效"
+        cls.suc_plugin[plugin_info.module_name] = plugin_info.version
+        logger.info(f"插件 {plugin_info.name} 已热加载", LOG_COMMAND)
+        return (
+            f"插件 {plugin_info.name} 安装成功! 已热加载，命令可立即使用\n"
+            "注意: 该插件的启动钩子(on_startup)未执行，且未注册到真寻插件管理，"
+            "依赖启动初始化或插件管理的功能需重启后生效"
+        )
 
     @classmethod
-    async def remove_plugin(cls, plugin_id: str) -> str:
+    async def remove_plugin(cls, plugin_id: str, prune: bool = False) -> str:
         """移除插件
 
         参数:
             plugin_id: 插件id或模块名
+            prune: 是否一并卸载不再被其他插件需要的依赖
 
         返回:
             str: 返回消息
         """
+        await cls.wait_warm_up()
         plugin_list: list[StorePluginInfo] = await cls.get_data()
         try:
             plugin_key = await cls._get_module_by_pypi_id_name(plugin_id)
@@ -285,23 +592,66 @@ class StoreManager:
         if not plugin_info:
             return f"插件 {plugin_key} 不存在"
         path = PLUGIN_FLODER / plugin_info.module_name
-        if not path.exists():
-            return f"插件 {plugin_info.name} 不存在..."
-        logger.debug(f"尝试移除插件 {plugin_info.name} 文件: {path}", LOG_COMMAND)
-        await path_rm(path)
-        await Plugin(plugin_info).remove_local_ver()
-        return f"插件 {plugin_info.name} 移除成功! 重启后生效"
+        async with JobQueue.module_lock(plugin_info.module_name):
+            if not path.exists():
+                return f"插件 {plugin_info.name} 不存在..."
+            # 需在删除插件目录前计算，否则无法读取其依赖
+            index = await asyncio.to_thread(DependencyIndex)
+            orphans = index.orphans(plugin_info.module_name)
+            logger.debug(f"尝试移除插件 {plugin_info.name} 文件: {path}", LOG_COMMAND)
+            await path_rm(path)
+            await Plugin(plugin_info).remove_local_ver()
+            remove_record(plugin_info.module_name)
+        await prune_wheels()
+        result = f"插件 {plugin_info.name} 移除成功! 重启后生效"
+        if not orphans:
+            return result
+        if not prune:
+            return (
+                f"{result}\n以下依赖已无其他插件使用: {', '.join(orphans)}"
+                f"\n使用 nb商店 remove {plugin_id} --prune 可一并卸载"
+            )
+        try:
+            await uninstall_requirements(orphans)
+        except Exception as e:
+            logger.error(f"卸载插件 {plugin_info.name} 的依赖失败", LOG_COMMAND, e=e)
+            return f"{result}\n卸载依赖失败 e: {e}"
+        logger.info(f"已卸载插件 {plugin_info.name} 的依赖: {orphans}", LOG_COMMAND)
+        return f"{result}\n已卸载依赖: {', '.join(orphans)}"
 
     @classmethod
-    async def update_plugin(cls, plugin_id: str) -> str:
+    async def dist_dependents(cls, dist: str) -> str:
+        """查询依赖某个包的已安装插件
+
+        参数:
+            dist: pypi包名
+
+        返回:
+            str: 返回消息
+        """
+        index = await asyncio.to_thread(DependencyIndex)
+        if normalize(dist) in index.protected:
+            tip = f"\n{dist} 为bot自身依赖"
+        else:
+            tip = ""
+        if not (modules := index.dependents(dist)):
+            return f"没有已安装的插件依赖 {dist}{tip}"
+        return f"依赖 {dist} 的插件:\n\t- " + "\n\t- ".join(sorted(modules)) + tip
+
+    @classmethod
+    async def update_plugin(
+        cls, plugin_id: str, progress: ProgressCallback | None = None
+    ) -> str:
         """更新插件
 
         参数:
             plugin_id: 插件id
+            progress: 进度回调
 
         返回:
             str: 返回消息
         """
+        await cls.wait_warm_up()
         plugin_list: list[StorePluginInfo] = await cls.get_data()
         try:
             plugin_key = await cls._get_module_by_pypi_id_name(plugin_id)
@@ -321,12 +671,185 @@ class StoreManager:
         logger.debug(f"当前NB商店插件列表: {cls.suc_plugin}", LOG_COMMAND)
         if cls.suc_plugin[plugin_info.module_name] == plugin_info.version:
             return f"插件 {plugin_info.name} 已是最新版本"
-        await common_install_plugin(plugin_info)
+        await common_install_plugin(plugin_info, progress)
         return f"插件 {plugin_info.name} 更新成功! 重启后生效"
 
     @classmethod
-    async def update_all_plugin(cls) -> str:
-        """更新插件
+    async def export_lockfile(cls, path: str | None = None) -> str:
+        """导出已安装插件的锁文件
+
+        参数:
+            path: 锁文件路径，为空时使用默认路径
+
+        返回:
+            str: 返回消息
+        """
+        await cls.wait_warm_up()
+        plugin_list: list[StorePluginInfo] = await cls.get_data()
+        ver_data = await init_ver_data()
+        locked = [
+            lock_entry(p.module_name, p.project_link, version)
+            for p in plugin_list
+            if (version := ver_data.get(p.project_link))
+            and (PLUGIN_FLODER / p.module_name).exists()
+        ]
+        if not locked:
+            return "没有已安装的插件"
+        lock_path = Path(path) if path else LOCKFILE_PATH
+        await write_lockfile(locked, lock_path)
+        logger.info(f"已导出锁文件 {lock_path}", LOG_COMMAND)
+        return f"已导出 {len(locked)} 个插件至 {lock_path.absolute()}"
+
+    @classmethod
+    async def import_lockfile(
+        cls, path: str | None = None, progress: ProgressCallback | None = None
+    ) -> str:
+        """按锁文件批量安装插件
+
+        参数:
+            path: 锁文件路径，为空时使用默认路径
+            progress: 进度回调
+
+        返回:
+            str: 返回消息
+        """
+
+        async def report(message: str):
+            if progress:
+                await progress(message)
+
+        lock_path = Path(path) if path else LOCKFILE_PATH
+        if not lock_path.exists():
+            return f"锁文件 {lock_path} 不存在"
+        await cls.wait_warm_up()
+        plugin_map = {p.module_name: p for p in await cls.get_data()}
+        await init_ver_data()
+        pending: list[tuple[LockedPlugin, StorePluginInfo]] = []
+        skipped: list[str] = []
+        failed: list[str] = []
+        for entry in await read_lockfile(lock_path):
+            plugin_info = plugin_map.get(entry.module_name)
+            if not plugin_info:
+                failed.append(f"{entry.module_name}: 商店中不存在该插件")
+            elif (PLUGIN_FLODER / entry.module_name).exists() and (
+                lock_entry(
+                    entry.module_name,
+                    entry.project_link,
+                    Plugin(plugin_info).get_local_ver() or "",
+                ).version
+                == entry.version
+            ):
+                skipped.append(plugin_info.name)
+            else:
+                pending.append((entry, plugin_info))
+        await report(f"正在并行下载 {len(pending)} 个安装包")
+        wheels = await fetch_locked_wheels([entry for entry, _ in pending])
+        installed: list[str] = []
+        requirements: list[str] = []
+        for (entry, plugin_info), whl in zip(pending, wheels):
+            if isinstance(whl, BaseException):
+                failed.append(f"{plugin_info.name}: {whl}")
+                continue
+            await report(f"正在解压 {plugin_info.name}")
+            try:
+                async with JobQueue.module_lock(plugin_info.module_name):
+                    target_path = await extract_plugin(
+                        plugin_info, whl[0], whl[1], entry.version
+                    )
+            except Exception as e:
+                logger.error(f"解压插件 {plugin_info.name} 失败", LOG_COMMAND, e=e)
+                failed.append(f"{plugin_info.name}: {e}")
+                continue
+            installed.append(f"{plugin_info.name}=={entry.version}")
+            if (target_path / "requirements.txt").exists():
+                async with aiofiles.open(
+                    target_path / "requirements.txt", encoding="utf-8"
+                ) as f:
+                    requirements.extend((await f.read()).splitlines())
+        if requirements := list(dict.fromkeys(r for r in requirements if r.strip())):
+            # 全部插件的依赖合并为一次pip调用，合并文件安装后即删除
+            fd, name = tempfile.mkstemp(prefix="nb_store_lock_", suffix=".txt")
+            os.close(fd)
+            merged = Path(name)
+            try:
+                async with aiofiles.open(merged, "w", encoding="utf-8") as f:
+                    await f.write("\n".join(requirements) + "\n")
+                await report(f"正在安装 {len(requirements)} 个依赖")
+                await install_requirement(merged)
+            finally:
+                merged.unlink(missing_ok=True)
+        result = f"--已安装{len(installed)}个插件 {len(skipped)}个已是锁定版本 "
+        result += f"{len(failed)}个失败--"
+        if installed:
+            result += "\n* 以下插件安装成功:\n\t- " + "\n\t- ".join(installed)
+        if failed:
+            result += "\n* 以下插件安装失败:\n\t- " + "\n\t- ".join(failed)
+        return result + ("\n重启后生效" if installed else "")
+
+    @classmethod
+    async def plan_update(cls) -> str:
+        """预览更新全部插件时将要下载的内容与依赖变化
+
+        返回:
+            str: 返回消息
+        """
+        await cls.wait_warm_up()
+        plugin_list: list[StorePluginInfo] = await cls.get_data()
+        if cls.suc_plugin is None:
+            cls.suc_plugin = await cls.init_suc_plugin()
+        outdated = cls.get_facet_index(plugin_list).select(
+            PluginFilter(outdated=True), cls.suc_plugin
+        )
+        if not outdated:
+            return "全部插件已是最新版本"
+        return await build_update_plan(
+            [(p, cls.suc_plugin[p.module_name]) for p in outdated]
+        )
+
+    @classmethod
+    async def verify_plugin(
+        cls, plugin_id: str | None = None, repair: bool = False
+    ) -> str:
+        """校验插件文件完整性
+
+        参数:
+            plugin_id: 插件id，为空时校验全部插件
+            repair: 是否从缓存的安装包中恢复异常文件
+
+        返回:
+            str: 返回消息
+        """
+        if plugin_id:
+            try:
+                modules = [await cls._get_module_by_pypi_id_name(plugin_id)]
+            except ValueError as e:
+                return str(e)
+        else:
+            modules = list_records()
+        results = await verify_plugins(modules)
+        if not results:
+            return "没有可校验的插件，仅校验通过本插件安装或更新的插件"
+        message = format_results(results)
+        if repair:
+            for result in results:
+                if not (result.missing or result.modified):
+                    continue
+                try:
+                    async with JobQueue.module_lock(result.module_name):
+                        repaired = await repair_plugin(result)
+                    message += (
+                        f"\n插件 {result.module_name} 已恢复 {len(repaired)} 个文件"
+                    )
+                except Exception as e:
+                    logger.error(
+                        f"恢复插件 {result.module_name} 失败", LOG_COMMAND, e=e
+                    )
+                    message += f"\n插件 {result.module_name} 恢复失败 e: {e}"
+        return message
+
+    @classmethod
+    async def rollback_plugin(cls, plugin_id: str) -> str:
+        """回滚插件至更新前的快照
 
         参数:
             plugin_id: 插件id
@@ -334,6 +857,49 @@ class StoreManager:
         返回:
             str: 返回消息
         """
+        await cls.wait_warm_up()
+        plugin_list: list[StorePluginInfo] = await cls.get_data()
+        try:
+            plugin_key = await cls._get_module_by_pypi_id_name(plugin_id)
+        except ValueError as e:
+            return str(e)
+        plugin_info = next(
+            (p for p in plugin_list if p.module_name == plugin_key), None
+        )
+        if not plugin_info:
+            return f"插件 {plugin_key} 不存在"
+        async with JobQueue.module_lock(plugin_info.module_name):
+            meta = await restore_snapshot(plugin_info.module_name)
+            if meta is None:
+                return f"插件 {plugin_info.name} 没有可回滚的快照"
+            version = meta.get("version")
+            if record := meta.get("record"):
+                await write_record(plugin_info.module_name, record)
+            else:
+                remove_record(plugin_info.module_name)
+            plugin = Plugin(plugin_info)
+            if version:
+                await plugin.set_local_ver(version)
+            else:
+                await plugin.remove_local_ver()
+        # 回滚后更新时下载的新版本安装包不再被引用
+        await prune_wheels()
+        if cls.suc_plugin is not None and plugin_info.module_name in cls.suc_plugin:
+            cls.suc_plugin[plugin_info.module_name] = version or "Unknown"
+        logger.info(f"插件 {plugin_info.name} 已回滚至 {version}", LOG_COMMAND)
+        return f"插件 {plugin_info.name} 已回滚至版本 {version or '未知'}! 重启后生效"
+
+    @classmethod
+    async def update_all_plugin(cls, progress: ProgressCallback | None = None) -> str:
+        """更新插件
+
+        参数:
+            progress: 进度回调
+
+        返回:
+            str: 返回消息
+        """
+        await cls.wait_warm_up()
         plugin_list: list[StorePluginInfo] = await cls.get_data()
         plugin_name_list = [p.name for p in plugin_list]
         update_failed_list = []
@@ -363,7 +929,7 @@ class StoreManager:
                     f"正在更新插件 {plugin_info.name}({plugin_info.module_name})",
                     LOG_COMMAND,
                 )
-                await common_install_plugin(plugin_info)
+                await common_install_plugin(plugin_info, progress)
                 update_success_list.append(plugin_info.name)
             except Exception as e:
                 logger.error(
@@ -409,4 +975,14 @@ class StoreManager:
         for p in plugin_list:
             if plugin_id in [p.project_link, p.name]:
                 return p.module_name
+        fuzzy_index = cls.get_fuzzy_index(plugin_list)
+        if plugin_info := fuzzy_index.resolve(plugin_id):
+            logger.debug(
+                f"插件 {plugin_id} 已自动匹配为 {plugin_info.project_link}",
+                LOG_COMMAND,
+            )
+            return plugin_info.module_name
+        if suggestions := fuzzy_index.suggest(plugin_id):
+            names = "\n".join(f"- {p.name}({p.project_link})" for p in suggestions)
+            raise ValueError(f"插件 包名 / 名称 不存在... 你是否想找:\n{names}")
         raise ValueError("插件 包名 / 名称 不存在...")
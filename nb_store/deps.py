@@ -0,0 +1,161 @@
+from collections import defaultdict
+from importlib.metadata import distributions, packages_distributions
+from pathlib import Path
+import re
+
+import nonebot
+from packaging.requirements import InvalidRequirement, Requirement
+
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, PLUGIN_FLODER
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11, nonebot2 自带 tomli
+    import tomli as tomllib
+
+NORMALIZE_PATTERN = re.compile(r"[-_.]+")
+PROTECTED_DISTS = {"pip", "setuptools", "wheel"}
+"""任何情况下都不会被清理的包"""
+
+
+def normalize(name: str) -> str:
+    """PEP 503 包名规范化"""
+    return NORMALIZE_PATTERN.sub("-", name).lower()
+
+
+def parse_requirement(line: str) -> str | None:
+    """解析单行依赖，返回规范化后的包名，忽略注释、选项与不适用于当前环境的依赖"""
+    line = line.split("#", 1)[0].strip()
+    if not line or line.startswith("-"):
+        return None
+    try:
+        req = Requirement(line)
+    except InvalidRequirement:
+        return None
+    if req.marker and not req.marker.evaluate({"extra": ""}):
+        return None
+    return normalize(req.name)
+
+
+def read_requirements(path: Path) -> set[str]:
+    """读取requirements.txt中的包名"""
+    if not path.exists():
+        return set()
+    lines = path.read_text("utf-8", errors="ignore").splitlines()
+    return {name for line in lines if (name := parse_requirement(line))}
+
+
+def read_bot_requirements(root: Path) -> set[str]:
+    """读取bot自身声明的依赖(pyproject.toml与requirements.txt)"""
+    names = read_requirements(root / "requirements.txt")
+    pyproject = root / "pyproject.toml"
+    if not pyproject.exists():
+        return names
+    try:
+        data = tomllib.loads(pyproject.read_text("utf-8"))
+    except (tomllib.TOMLDecodeError, UnicodeDecodeError) as e:
+        logger.warning("解析 pyproject.toml 失败", LOG_COMMAND, e=e)
+        return names
+    for line in data.get("project", {}).get("dependencies", []):
+        if name := parse_requirement(line):
+            names.add(name)
+    poetry = data.get("tool", {}).get("poetry", {}).get("dependencies", {})
+    names.update(normalize(name) for name in poetry if name != "python")
+    return names
+
+
+def read_external_plugin_requirements(plugin_path: Path) -> set[str]:
+    """读取非商店插件(真寻内置插件、真寻插件商店插件等)的依赖及其所属的包"""
+    names: set[str] = set()
+    store_path = plugin_path.resolve()
+    top_level = packages_distributions()
+    for plugin in nonebot.get_loaded_plugins():
+        if not (file := getattr(plugin.module, "__file__", None)):
+            continue
+        path = Path(file).resolve().parent
+        if path.is_relative_to(store_path):
+            continue
+        names |= read_requirements(path / "requirements.txt")
+        # 以pip安装的插件本身也不能被清理
+        root = plugin.module_name.split(".", 1)[0]
+        names.update(normalize(dist) for dist in top_level.get(root, []))
+    return names
+
+
+class DependencyIndex:
+    """已安装插件的依赖图
+
+    正向边来自插件的requirements.txt与已安装包的元数据，
+    反向索引记录每个包被哪些商店插件(直接或间接)依赖
+    """
+
+    def __init__(self, plugin_path: Path = PLUGIN_FLODER, root: Path | None = None):
+        self.requires: dict[str, set[str]] = {}
+        """包名 -> 其依赖的包名"""
+        self.required_by: dict[str, set[str]] = defaultdict(set)
+        """包名 -> 依赖它的已安装包名"""
+        for dist in distributions():
+            if not (name := dist.metadata["Name"]):
+                continue
+            name = normalize(name)
+            deps = {d for r in dist.requires or [] if (d := parse_requirement(r))}
+            self.requires[name] = deps
+            for dep in deps:
+                self.required_by[dep].add(name)
+        self.plugin_requires: dict[str, set[str]] = {}
+        """插件模块名 -> 直接依赖"""
+        if plugin_path.exists():
+            for path in plugin_path.iterdir():
+                if path.is_dir():
+                    self.plugin_requires[path.name] = read_requirements(
+                        path / "requirements.txt"
+                    )
+        self.plugin_closure = {
+            module: self.closure(deps) for module, deps in self.plugin_requires.items()
+        }
+        self.dependents_index: dict[str, set[str]] = defaultdict(set)
+        """包名 -> 依赖它的插件模块名"""
+        for module, deps in self.plugin_closure.items():
+            for dep in deps:
+                self.dependents_index[dep].add(module)
+        self.protected = PROTECTED_DISTS | self.closure(
+            read_bot_requirements(root or Path.cwd())
+            | read_external_plugin_requirements(plugin_path)
+        )
+        """bot自身与非商店插件需要的包"""
+
+    def closure(self, names: set[str]) -> set[str]:
+        """计算已安装包的传递依赖闭包"""
+        result: set[str] = set()
+        stack = [name for name in names if name in self.requires]
+        while stack:
+            name = stack.pop()
+            if name in result:
+                continue
+            result.add(name)
+            stack.extend(d for d in self.requires[name] if d in self.requires)
+        return result
+
+    def dependents(self, dist: str) -> set[str]:
+        """依赖该包的商店插件模块名"""
+        return self.dependents_index.get(normalize(dist), set())
+
+    def orphans(self, module: str) -> list[str]:
+        """移除插件后不再被任何插件(含非商店插件)、bot或其他已安装包需要的依赖"""
+        candidates = {
+            dep
+            for dep in self.plugin_closure.get(module, set())
+            if self.dependents(dep) <= {module} and dep not in self.protected
+        }
+        # 仍被候选集合之外的已安装包依赖的不能移除，迭代至不动点
+        changed = True
+        while changed:
+            changed = False
+            for dep in list(candidates):
+                if self.required_by.get(dep, set()) - candidates:
+                    candidates.discard(dep)
+                    changed = True
+        logger.debug(f"插件 {module} 的孤立依赖: {sorted(candidates)}", LOG_COMMAND)
+        return sorted(candidates)
@@ -0,0 +1,113 @@
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import datetime, timezone
+
+from .models import PluginFilter, StorePluginInfo
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """按从小到大的顺序遍历位图中被置位的下标"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def utc_timestamp(time: datetime) -> float:
+    """时间戳，未带时区的时间按UTC处理而不是按主机本地时区"""
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=timezone.utc)
+    return time.timestamp()
+
+
+class FacetIndex:
+    """插件分面索引
+
+    每个分面值对应一个整数位图，第 i 位表示插件列表中的第 i 个插件，
+    多个筛选条件通过按位与组合
+    """
+
+    def __init__(self, plugins: list[StorePluginInfo]):
+        self.plugins = plugins
+        self.all = (1 << len(plugins)) - 1
+        self.official = 0
+        self.valid = 0
+        self.tags: dict[str, int] = defaultdict(int)
+        self.authors: dict[str, int] = defaultdict(int)
+        self.module_ids: dict[str, int] = {}
+        for i, plugin in enumerate(plugins):
+            bit = 1 << i
+            if plugin.is_official:
+                self.official |= bit
+            if plugin.valid:
+                self.valid |= bit
+            for tag in plugin.tags:
+                self.tags[tag.label.lower()] |= bit
+            self.authors[plugin.author.lower()] |= bit
+            self.module_ids[plugin.module_name] = i
+        order = sorted(
+            range(len(plugins)), key=lambda i: utc_timestamp(plugins[i].time)
+        )
+        self.time_ids = order
+        """按更新时间升序排列的插件下标"""
+        self.times = [utc_timestamp(plugins[i].time) for i in order]
+
+    def time_range(self, since: float | None, until: float | None) -> int:
+        """获取更新时间位于 [since, until) 内的插件位图"""
+        lo = 0 if since is None else bisect_left(self.times, since)
+        hi = len(self.times) if until is None else bisect_left(self.times, until)
+        mask = 0
+        for i in self.time_ids[lo:hi]:
+            mask |= 1 << i
+        return mask
+
+    def installed(self, suc_plugin: dict[str, str]) -> int:
+        """已安装插件位图"""
+        mask = 0
+        for module in suc_plugin:
+            if (i := self.module_ids.get(module)) is not None:
+                mask |= 1 << i
+        return mask
+
+    def outdated(self, suc_plugin: dict[str, str]) -> int:
+        """可更新插件位图"""
+        mask = 0
+        for module, local_ver in suc_plugin.items():
+            i = self.module_ids.get(module)
+            if i is not None and self.plugins[i].version != local_ver:
+                mask |= 1 << i
+        return mask
+
+    def select(
+        self, filters: PluginFilter, suc_plugin: dict[str, str]
+    ) -> list[StorePluginInfo]:
+        """按筛选条件获取插件
+
+        参数:
+            filters: 筛选条件
+            suc_plugin: 已安装插件 模块名: 本地版本号
+
+        返回:
+            list[StorePluginInfo]: 符合条件的插件
+        """
+        mask = self.all
+        for tag in filters.tags:
+            mask &= self.tags.get(tag.lower(), 0)
+        if filters.official:
+            mask &= self.official
+        if filters.valid:
+            mask &= self.valid
+        if filters.author:
+            mask &= self.authors.get(filters.author.lower(), 0)
+        if filters.installed is not None:
+            installed = self.installed(suc_plugin)
+            mask &= installed if filters.installed else self.all & ~installed
+        if filters.outdated:
+            mask &= self.outdated(suc_plugin)
+        if filters.since or filters.until:
+            mask &= self.time_range(
+                utc_timestamp(filters.since) if filters.since else None,
+                utc_timestamp(filters.until) if filters.until else None,
+            )
+        return [self.plugins[i] for i in iter_bits(mask)]
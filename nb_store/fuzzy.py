@@ -0,0 +1,83 @@
+from collections import Counter, defaultdict
+import re
+
+from .models import StorePluginInfo
+
+SEPARATOR_PATTERN = re.compile(r"[-_.\s]+")
+PREFIX_PATTERN = re.compile(r"^nonebot-(?:plugin-)?")
+
+
+def normalize(text: str) -> str:
+    """统一大小写与分隔符"""
+    return SEPARATOR_PATTERN.sub("-", text.strip().lower()).strip("-")
+
+
+def trigrams(text: str) -> set[str]:
+    """文本的三元组集合，首尾补齐以便短文本也能匹配
+
+    去除公共的 nonebot-plugin- 前缀，避免其主导相似度
+    """
+    padded = f"  {PREFIX_PATTERN.sub('', text)} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """插件名称容错索引
+
+    对插件名称、模块名与pypi包名归一化后建立三元组倒排索引，
+    用于拼写错误时给出候选插件
+    """
+
+    def __init__(self, plugins: list[StorePluginInfo]):
+        self.plugins = plugins
+        self.exact: dict[str, set[int]] = defaultdict(set)
+        """归一化名称 -> 插件下标"""
+        self.keys: list[tuple[int, int]] = []
+        """(插件下标, 三元组数量)"""
+        self.postings: dict[str, list[int]] = defaultdict(list)
+        """三元组 -> keys 下标"""
+        for i, plugin in enumerate(plugins):
+            names = {
+                normalize(name)
+                for name in (plugin.name, plugin.module_name, plugin.project_link)
+            }
+            for name in names:
+                self.exact[name].add(i)
+                grams = trigrams(name)
+                key_id = len(self.keys)
+                self.keys.append((i, len(grams)))
+                for gram in grams:
+                    self.postings[gram].append(key_id)
+
+    def resolve(self, text: str) -> StorePluginInfo | None:
+        """忽略大小写与分隔符差异进行匹配，仅在结果唯一时返回"""
+        matched = self.exact.get(normalize(text), set())
+        if len(matched) == 1:
+            return self.plugins[next(iter(matched))]
+        return None
+
+    def suggest(
+        self, text: str, limit: int = 3, threshold: float = 0.3
+    ) -> list[StorePluginInfo]:
+        """获取相似度最高的候选插件
+
+        参数:
+            text: 输入文本
+            limit: 候选数量
+            threshold: 最低相似度(三元组Jaccard系数)
+
+        返回:
+            list[StorePluginInfo]: 候选插件
+        """
+        grams = trigrams(normalize(text))
+        hits: Counter[int] = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+        scores: dict[int, float] = {}
+        for key_id, common in hits.items():
+            plugin_id, size = self.keys[key_id]
+            score = common / (len(grams) + size - common)
+            if score >= threshold and score > scores.get(plugin_id, 0):
+                scores[plugin_id] = score
+        best = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [self.plugins[i] for i, _ in best]
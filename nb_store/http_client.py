@@ -0,0 +1,182 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+import importlib.util
+from typing import Any, Literal
+from urllib.parse import urlparse
+
+import httpx
+
+from zhenxun.configs.config import BotConfig
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, get_config
+
+RequestKind = Literal["registry", "index", "wheel"]
+
+TIMEOUTS: dict[str, httpx.Timeout] = {
+    "registry": httpx.Timeout(15, connect=5),
+    "index": httpx.Timeout(10, connect=3),
+    "wheel": httpx.Timeout(60, connect=5),
+}
+"""各类请求的超时配置"""
+
+
+class StoreHttp:
+    """nb商店共享的HTTP连接池
+
+    所有插件列表、simple索引与安装包请求复用同一个客户端，
+    以保持长连接并避免重复的TLS握手
+    """
+
+    client: httpx.AsyncClient | None = None
+    host_limits: dict[tuple[str, bool], asyncio.Semaphore] = {}
+    stats: dict[str, dict[str, int]] = defaultdict(
+        lambda: {"requests": 0, "errors": 0, "bytes": 0}
+    )
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """获取共享客户端，首次调用时创建"""
+        if cls.client is None:
+            http2 = importlib.util.find_spec("h2") is not None
+            encodings = ["gzip", "deflate"]
+            if importlib.util.find_spec("brotli") is not None:
+                encodings.append("br")
+            cls.client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=get_config("HTTP_MAX_CONNECTIONS", 20),
+                    max_keepalive_connections=get_config("HTTP_MAX_CONNECTIONS", 20),
+                    keepalive_expiry=60,
+                ),
+                headers={"Accept-Encoding": ", ".join(encodings)},
+                proxy=BotConfig.system_proxy or None,
+                follow_redirects=True,
+            )
+            logger.debug(
+                f"HTTP连接池已创建, http2: {http2}, 压缩: {encodings}", LOG_COMMAND
+            )
+        return cls.client
+
+    @classmethod
+    def get_host_limit(cls, url: str, kind: RequestKind) -> asyncio.Semaphore:
+        """获取单个主机的并发限制
+
+        索引页面、元数据与HEAD等小请求单独限流，不会排在安装包下载之后
+        """
+        key = (urlparse(url).netloc, kind == "index")
+        if key not in cls.host_limits:
+            cls.host_limits[key] = asyncio.Semaphore(
+                get_config("HTTP_MAX_INDEX_REQUESTS_PER_HOST", 32)
+                if kind == "index"
+                else get_config("HTTP_MAX_CONNECTIONS_PER_HOST", 6)
+            )
+        return cls.host_limits[key]
+
+    @classmethod
+    async def get(
+        cls, url: str, kind: RequestKind = "index", **kwargs: Any
+    ) -> httpx.Response:
+        """发起GET请求
+
+        参数:
+            url: 请求地址
+            kind: 请求类型，决定超时配置
+            kwargs: 传递给 httpx 的其他参数
+
+        返回:
+            httpx.Response: 响应
+        """
+        kwargs.setdefault("timeout", TIMEOUTS[kind])
+        stats = cls.stats[kind]
+        stats["requests"] += 1
+        async with cls.get_host_limit(url, kind):
+            try:
+                response = await cls.get_client().get(url, **kwargs)
+            except Exception:
+                stats["errors"] += 1
+                raise
+        stats["bytes"] += len(response.content)
+        return response
+
+    @classmethod
+    async def download(
+        cls,
+        url: str,
+        kind: RequestKind = "wheel",
+        progress: Callable[[int, int | None], Awaitable[None]] | None = None,
+    ) -> bytes:
+        """流式下载文件
+
+        参数:
+            url: 下载地址
+            kind: 请求类型，决定超时配置
+            progress: 进度回调，参数为已下载字节数与总字节数(未知时为None)
+
+        返回:
+            bytes: 文件内容
+        """
+        stats = cls.stats[kind]
+        stats["requests"] += 1
+        chunks: list[bytes] = []
+        received = 0
+        async with cls.get_host_limit(url, kind):
+            try:
+                async with cls.get_client().stream(
+                    "GET", url, timeout=TIMEOUTS[kind]
+                ) as response:
+                    response.raise_for_status()
+                    length = response.headers.get("Content-Length")
+                    total = int(length) if length else None
+                    async for chunk in response.aiter_bytes():
+                        chunks.append(chunk)
+                        received += len(chunk)
+                        if progress:
+                            await progress(received, total)
+            except Exception:
+                stats["errors"] += 1
+                raise
+        stats["bytes"] += received
+        return b"".join(chunks)
+
+    @classmethod
+    async def head(
+        cls, url: str, kind: RequestKind = "index", **kwargs: Any
+    ) -> httpx.Response:
+        """发起HEAD请求"""
+        kwargs.setdefault("timeout", TIMEOUTS[kind])
+        stats = cls.stats[kind]
+        stats["requests"] += 1
+        async with cls.get_host_limit(url, kind):
+            try:
+                return await cls.get_client().head(url, **kwargs)
+            except Exception:
+                stats["errors"] += 1
+                raise
+
+    @classmethod
+    async def close(cls):
+        """关闭连接池"""
+        if cls.client:
+            await cls.client.aclose()
+            cls.client = None
+
+    @classmethod
+    def get_stats(cls) -> str:
+        """连接池统计信息"""
+        lines = ["HTTP连接池统计:"]
+        if cls.client:
+            # httpx 未公开连接池状态，取不到时忽略
+            pool = getattr(getattr(cls.client, "_transport", None), "_pool", None)
+            connections = getattr(pool, "connections", None)
+            if connections is not None:
+                lines.append(f"当前连接数: {len(connections)}")
+        else:
+            lines.append("连接池未创建")
+        for kind, stats in cls.stats.items():
+            lines.append(
+                f"{kind}: 请求 {stats['requests']} 次, 失败 {stats['errors']} 次, "
+                f"接收 {stats['bytes'] / 1024:.1f} KB"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,258 @@
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+from dataclasses import dataclass, field
+import hashlib
+import os
+from pathlib import Path
+
+import aiofiles
+from nonebot.utils import run_sync
+import ujson
+
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, PLUGIN_FLODER
+from .snapshot import SNAPSHOT_PATH
+from .utils import (
+    DATA_PATH,
+    get_record_rows,
+    is_code_file,
+    open_zip,
+    path_mkdir,
+    zip_read,
+)
+
+RECORD_PATH = DATA_PATH / "records"
+"""插件安装记录目录"""
+WHEEL_PATH = DATA_PATH / "wheels"
+"""已安装插件的安装包缓存目录"""
+
+IGNORED_FILES = {"requirements.txt"}
+"""安装时生成、不在RECORD中的文件"""
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class VerifyResult:
+    """插件完整性校验结果"""
+
+    module_name: str
+    missing: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.modified or self.extra)
+
+
+def hash_file(path: Path) -> tuple[str, int]:
+    """分块读取文件并计算RECORD格式的哈希值与大小"""
+    sha = hashlib.sha256()
+    size = 0
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha.update(chunk)
+            size += len(chunk)
+    digest = base64.urlsafe_b64encode(sha.digest()).rstrip(b"=").decode()
+    return f"sha256={digest}", size
+
+
+async def save_record(module_name: str, whl_filename: str, whl_bytes: bytes):
+    """
+    保存插件的安装记录与安装包
+
+    参数:
+        :module_name str: 插件模块名
+        :whl_filename str: 安装包文件名
+        :whl_bytes bytes: 安装包内容
+    """
+    target = PLUGIN_FLODER / module_name
+    zf = await open_zip(whl_bytes)
+    try:
+        rows = await get_record_rows(zf)
+    finally:
+        await run_sync(zf.close)()
+    files: dict[str, dict] = {}
+    prefix = f"{module_name}/"
+    for row in rows:
+        member = row[0]
+        if not is_code_file(member):
+            continue
+        # 插件目录结构修复后, 包目录下的文件被上移一级
+        rel = member
+        if not (target / rel).exists() and member.startswith(prefix):
+            rel = member[len(prefix) :]
+        files[rel] = {
+            "member": member,
+            "hash": row[1] if len(row) > 1 else "",
+            "size": int(row[2]) if len(row) > 2 and row[2] else None,
+        }
+    path_mkdir(WHEEL_PATH)
+    async with aiofiles.open(WHEEL_PATH / whl_filename, "wb") as f:
+        await f.write(whl_bytes)
+    record = {
+        "wheel": whl_filename,
+        "sha256": hashlib.sha256(whl_bytes).hexdigest(),
+        "files": files,
+    }
+    await write_record(module_name, record)
+
+
+async def write_record(module_name: str, record: dict):
+    """写入插件的安装记录"""
+    path_mkdir(RECORD_PATH)
+    async with aiofiles.open(
+        RECORD_PATH / f"{module_name}.json", "w", encoding="utf-8"
+    ) as f:
+        await f.write(ujson.dumps(record, ensure_ascii=False, indent=2))
+
+
+def load_record(module_name: str) -> dict | None:
+    """读取插件的安装记录"""
+    path = RECORD_PATH / f"{module_name}.json"
+    if not path.exists():
+        return None
+    return ujson.loads(path.read_text(encoding="utf-8"))
+
+
+def list_records() -> list[str]:
+    """获取有安装记录的插件模块名"""
+    if not RECORD_PATH.exists():
+        return []
+    return sorted(p.stem for p in RECORD_PATH.glob("*.json"))
+
+
+def remove_record(module_name: str):
+    """移除插件的安装记录，安装包由 prune_wheels 统一清理"""
+    (RECORD_PATH / f"{module_name}.json").unlink(missing_ok=True)
+
+
+@run_sync
+def prune_wheels() -> list[str]:
+    """
+    删除不被当前安装记录或保留的快照引用的安装包
+
+    返回:
+        :list[str]: 已删除的安装包
+    """
+    if not WHEEL_PATH.exists():
+        return []
+    referenced = {
+        record["wheel"] for module in list_records() if (record := load_record(module))
+    }
+    for snapshot in SNAPSHOT_PATH.glob("*/*.json"):
+        with contextlib.suppress(ValueError, OSError):
+            if record := ujson.loads(snapshot.read_text(encoding="utf-8")).get(
+                "record"
+            ):
+                referenced.add(record["wheel"])
+    removed = []
+    for path in WHEEL_PATH.iterdir():
+        if path.is_file() and path.name not in referenced:
+            path.unlink(missing_ok=True)
+            removed.append(path.name)
+    if removed:
+        logger.debug(f"已清理不再使用的安装包: {removed}", LOG_COMMAND)
+    return removed
+
+
+def _scan_extra(target: Path, files: dict) -> list[str]:
+    extra = []
+    for root, dirs, names in os.walk(target):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in names:
+            rel = Path(root, name).relative_to(target).as_posix()
+            if rel not in files and rel not in IGNORED_FILES:
+                extra.append(rel)
+    return extra
+
+
+async def verify_plugin(
+    module_name: str, record: dict, executor: ThreadPoolExecutor
+) -> VerifyResult:
+    """在线程池中并行校验插件文件"""
+    loop = asyncio.get_running_loop()
+    target = PLUGIN_FLODER / module_name
+    result = VerifyResult(module_name)
+    files: dict[str, dict] = record["files"]
+
+    async def check(rel: str, info: dict):
+        path = target / rel
+        if not path.is_file():
+            result.missing.append(rel)
+            return
+        digest, size = await loop.run_in_executor(executor, hash_file, path)
+        if (info["hash"] and digest != info["hash"]) or (
+            info["size"] is not None and size != info["size"]
+        ):
+            result.modified.append(rel)
+
+    await asyncio.gather(*(check(rel, info) for rel, info in files.items()))
+    if target.exists():
+        result.extra = await loop.run_in_executor(executor, _scan_extra, target, files)
+    return result
+
+
+async def verify_plugins(modules: list[str]) -> list[VerifyResult]:
+    """
+    校验多个插件的完整性
+
+    参数:
+        :modules list[str]: 插件模块名
+
+    返回:
+        :list[VerifyResult]: 校验结果，缺少安装记录的插件被忽略
+    """
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as pool:
+        tasks = [
+            verify_plugin(module, record, pool)
+            for module in modules
+            if (record := load_record(module))
+        ]
+        return list(await asyncio.gather(*tasks))
+
+
+async def repair_plugin(result: VerifyResult) -> list[str]:
+    """
+    从缓存的安装包中恢复缺失与被修改的文件
+
+    返回:
+        :list[str]: 已恢复的文件
+    """
+    record = load_record(result.module_name)
+    if not record or not (WHEEL_PATH / record["wheel"]).exists():
+        raise FileNotFoundError(f"插件 {result.module_name} 的安装包缓存不存在")
+    async with aiofiles.open(WHEEL_PATH / record["wheel"], "rb") as f:
+        zf = await open_zip(await f.read())
+    repaired = []
+    target = PLUGIN_FLODER / result.module_name
+    try:
+        for rel in result.missing + result.modified:
+            data = await zip_read(zf, record["files"][rel]["member"])
+            path_mkdir((target / rel).parent)
+            async with aiofiles.open(target / rel, "wb") as f:
+                await f.write(data)
+            repaired.append(rel)
+    finally:
+        await run_sync(zf.close)()
+    logger.info(f"插件 {result.module_name} 已恢复 {len(repaired)} 个文件", LOG_COMMAND)
+    return repaired
+
+
+def format_results(results: list[VerifyResult]) -> str:
+    """生成校验结果文本"""
+    damaged = [r for r in results if not r.ok]
+    lines = [f"--已校验{len(results)}个插件 {len(damaged)}个异常--"]
+    for r in damaged:
+        lines.append(f"* {r.module_name}")
+        for title, files in (
+            ("缺失", r.missing),
+            ("被修改", r.modified),
+            ("多余", r.extra),
+        ):
+            if files:
+                lines.append(f"\t{title}: " + ", ".join(sorted(files)))
+    return "\n".join(lines)
@@ -0,0 +1,214 @@
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+import contextlib
+from dataclasses import dataclass, field
+from enum import Enum
+import time
+from typing import TypeVar
+
+from zhenxun.services.log import logger
+
+from .config import JOB_HISTORY_SIZE, JOB_PROGRESS_INTERVAL, LOG_COMMAND
+
+T = TypeVar("T")
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+"""进度回调，参数为进度说明"""
+
+
+async def finish_before_cancel(aw: Awaitable[T]) -> T:
+    """
+    执行不可中断的步骤，任务被取消时等待该步骤完成后再响应取消
+
+    参数:
+        :aw Awaitable: 步骤
+
+    返回:
+        :T: 步骤的结果
+    """
+    task = asyncio.ensure_future(aw)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        while not task.done():
+            with contextlib.suppress(asyncio.CancelledError):
+                await asyncio.shield(task)
+        raise
+
+
+class JobStatus(str, Enum):
+    QUEUED = "排队中"
+    RUNNING = "运行中"
+    DONE = "已完成"
+    FAILED = "失败"
+    CANCELLED = "已取消"
+
+
+@dataclass
+class InstallJob:
+    """安装任务"""
+
+    id: int
+    title: str
+    func: Callable[[ProgressCallback], Awaitable[str]]
+    """任务函数，参数为进度回调，返回结果消息"""
+    notify: ProgressCallback
+    """向发起者发送消息"""
+    status: JobStatus = JobStatus.QUEUED
+    progress: str = ""
+    created: float = field(default_factory=time.time)
+    task: asyncio.Task | None = None
+    last_notify: float = 0.0
+
+    async def report(self, message: str):
+        """更新进度，按间隔限流后发送给发起者"""
+        self.progress = message
+        now = time.monotonic()
+        if now - self.last_notify < JOB_PROGRESS_INTERVAL:
+            return
+        self.last_notify = now
+        await self._notify(f"[任务 {self.id}] {message}")
+
+    async def _notify(self, message: str):
+        try:
+            await self.notify(message)
+        except Exception as e:
+            logger.warning(f"任务 {self.id} 发送消息失败", LOG_COMMAND, e=e)
+
+
+class JobQueue:
+    """安装任务队列，由固定数量的worker依次执行"""
+
+    queue: asyncio.Queue[InstallJob] | None = None
+    workers: list[asyncio.Task] = []
+    jobs: dict[int, InstallJob] = {}
+    next_id: int = 1
+    module_locks: dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    @classmethod
+    def module_lock(cls, module_name: str) -> asyncio.Lock:
+        """修改插件目录时持有的锁，JOB_WORKERS大于1时同一插件的任务不会同时执行"""
+        return cls.module_locks[module_name]
+
+    @classmethod
+    def start(cls, workers: int):
+        """启动worker"""
+        if cls.queue is not None:
+            return
+        cls.queue = asyncio.Queue()
+        cls.workers = [
+            asyncio.create_task(cls._worker()) for _ in range(max(1, workers))
+        ]
+        logger.debug(f"安装任务队列已启动, worker数: {len(cls.workers)}", LOG_COMMAND)
+
+    @classmethod
+    async def shutdown(cls):
+        """取消全部worker与运行中的任务"""
+        for job in cls.jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        for worker in cls.workers:
+            worker.cancel()
+        await asyncio.gather(*cls.workers, return_exceptions=True)
+        cls.workers = []
+        cls.queue = None
+
+    @classmethod
+    def submit(
+        cls,
+        title: str,
+        func: Callable[[ProgressCallback], Awaitable[str]],
+        notify: ProgressCallback,
+        workers: int = 1,
+    ) -> InstallJob:
+        """
+        提交任务
+
+        参数:
+            :title str: 任务说明
+            :func Callable: 任务函数
+            :notify ProgressCallback: 向发起者发送消息的函数
+            :workers int: 队列尚未启动时使用的worker数
+
+        返回:
+            :InstallJob: 任务
+        """
+        cls.start(workers)
+        assert cls.queue
+        job = InstallJob(cls.next_id, title, func, notify)
+        cls.next_id += 1
+        cls.jobs[job.id] = job
+        cls.queue.put_nowait(job)
+        cls._prune()
+        return job
+
+    @classmethod
+    def _prune(cls):
+        finished = [
+            job_id
+            for job_id, job in cls.jobs.items()
+            if job.status not in (JobStatus.QUEUED, JobStatus.RUNNING)
+        ]
+        for job_id in finished[:-JOB_HISTORY_SIZE]:
+            cls.jobs.pop(job_id, None)
+
+    @classmethod
+    async def _worker(cls):
+        assert cls.queue
+        while True:
+            job = await cls.queue.get()
+            try:
+                await cls._run(job)
+            finally:
+                cls.queue.task_done()
+
+    @classmethod
+    async def _run(cls, job: InstallJob):
+        if job.status == JobStatus.CANCELLED:
+            return
+        job.status = JobStatus.RUNNING
+        job.task = asyncio.create_task(job.func(job.report))
+        try:
+            result = await job.task
+        except asyncio.CancelledError:
+            if job.status != JobStatus.CANCELLED:
+                # worker本身被取消
+                raise
+            await job._notify(f"[任务 {job.id}] {job.title} 已取消")
+            return
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            logger.error(f"任务 {job.id} {job.title} 失败", LOG_COMMAND, e=e)
+            await job._notify(f"[任务 {job.id}] {job.title} 失败 e: {e}")
+            return
+        job.status = JobStatus.DONE
+        job.progress = ""
+        await job._notify(f"[任务 {job.id}] {result}")
+
+    @classmethod
+    def cancel(cls, job_id: int) -> str:
+        """取消排队中或运行中的任务"""
+        job = cls.jobs.get(job_id)
+        if not job:
+            return f"任务 {job_id} 不存在"
+        if job.status not in (JobStatus.QUEUED, JobStatus.RUNNING):
+            return f"任务 {job_id} {job.status.value}，无法取消"
+        job.status = JobStatus.CANCELLED
+        if job.task and not job.task.done():
+            job.task.cancel()
+            return f"任务 {job_id} {job.title} 将在当前步骤完成后取消"
+        return f"任务 {job_id} {job.title} 已取消"
+
+    @classmethod
+    def summary(cls) -> str:
+        """任务队列概况"""
+        queued = sum(job.status == JobStatus.QUEUED for job in cls.jobs.values())
+        running = sum(job.status == JobStatus.RUNNING for job in cls.jobs.values())
+        lines = [f"--安装任务: {running}个运行中 {queued}个排队中--"]
+        for job in cls.jobs.values():
+            line = f"[{job.id}] {job.title} {job.status.value}"
+            if job.status == JobStatus.RUNNING and job.progress:
+                line += f": {job.progress}"
+            lines.append(line)
+        return "\n".join(lines)
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+import hashlib
+from pathlib import Path
+
+import aiofiles
+from nonebot.compat import model_dump
+from pydantic import BaseModel
+import ujson
+
+from .integrity import WHEEL_PATH, load_record
+from .mirror import download_whl
+from .utils import DATA_PATH, get_whl_filename, get_whl_version
+
+LOCKFILE_PATH = DATA_PATH / "nb_store.lock.json"
+"""默认的锁文件路径"""
+
+
+class LockedPlugin(BaseModel):
+    """锁文件中的插件"""
+
+    module_name: str
+    """模块名"""
+    project_link: str
+    """pypi包名"""
+    version: str
+    """版本"""
+    wheel: str | None = None
+    """安装包文件名"""
+    sha256: str | None = None
+    """安装包sha256"""
+
+
+async def write_lockfile(plugins: list[LockedPlugin], path: Path):
+    """写入锁文件"""
+    data = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "plugins": [model_dump(p) for p in plugins],
+    }
+    async with aiofiles.open(path, "w", encoding="utf-8") as f:
+        await f.write(ujson.dumps(data, ensure_ascii=False, indent=2))
+
+
+async def read_lockfile(path: Path) -> list[LockedPlugin]:
+    """读取锁文件"""
+    async with aiofiles.open(path, encoding="utf-8") as f:
+        data = ujson.loads(await f.read())
+    return [LockedPlugin(**p) for p in data.get("plugins", [])]
+
+
+def lock_entry(module_name: str, project_link: str, version: str) -> LockedPlugin:
+    """根据安装记录生成锁文件条目
+
+    plugin_ver.json 中保存的是商店登记的版本，实际安装的是当时索引中最新的安装包，
+    两者不一致时以安装记录中的安装包版本为准
+    """
+    record = load_record(module_name) or {}
+    if record.get("wheel") and (whl_version := get_whl_version(record["wheel"])):
+        version = str(whl_version)
+    return LockedPlugin(
+        module_name=module_name,
+        project_link=project_link,
+        version=version,
+        wheel=record.get("wheel"),
+        sha256=record.get("sha256"),
+    )
+
+
+async def read_cached_wheel(plugin: LockedPlugin) -> bytes | None:
+    """读取本地缓存中哈希一致的安装包"""
+    if not plugin.wheel or not (WHEEL_PATH / plugin.wheel).exists():
+        return None
+    async with aiofiles.open(WHEEL_PATH / plugin.wheel, "rb") as f:
+        data = await f.read()
+    if plugin.sha256 and hashlib.sha256(data).hexdigest() != plugin.sha256:
+        return None
+    return data
+
+
+async def fetch_locked_wheel(plugin: LockedPlugin) -> tuple[str, bytes]:
+    """
+    获取锁定版本的安装包，优先使用本地缓存
+
+    返回:
+        tuple[str, bytes]: 安装包文件名, 内容
+
+    异常:
+        FileNotFoundError: 未找到锁定版本的安装包
+        ValueError: 安装包哈希不一致
+    """
+    if (data := await read_cached_wheel(plugin)) is not None:
+        assert plugin.wheel
+        return plugin.wheel, data
+    whl = await download_whl(plugin.project_link, plugin.version)
+    if not whl:
+        raise FileNotFoundError(f"未找到 {plugin.project_link}=={plugin.version}")
+    url, data = whl
+    if plugin.sha256 and hashlib.sha256(data).hexdigest() != plugin.sha256:
+        raise ValueError(f"{plugin.project_link}=={plugin.version} 安装包哈希不一致")
+    return get_whl_filename(url), data
+
+
+async def fetch_locked_wheels(
+    plugins: list[LockedPlugin],
+) -> list[tuple[str, bytes] | BaseException]:
+    """并发获取全部锁定版本的安装包"""
+    return await asyncio.gather(
+        *(fetch_locked_wheel(p) for p in plugins), return_exceptions=True
+    )
@@ -0,0 +1,304 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import time
+from typing import TypeVar
+
+from zhenxun.services.log import logger
+
+from .config import (
+    LOG_COMMAND,
+    MIRROR_COOLDOWN,
+    MIRROR_EWMA_ALPHA,
+    MIRROR_FAILURE_THRESHOLD,
+    PYPI_SIMPLE_URL,
+    SIMPLE_CACHE_TTL,
+    WHEEL_CACHE_EVICT_INTERVAL,
+    WHEEL_CACHE_MAX_AGE,
+    get_config,
+)
+from .http_client import StoreHttp
+from .shared_cache import SharedCache
+from .utils import (
+    find_whl_url,
+    get_pip_index_url,
+    get_simple_url,
+    get_whl_filename,
+    select_whl_link,
+    select_whl_url,
+)
+
+T = TypeVar("T")
+
+SIMPLE_HEADERS = {"User-Agent": "pip/25.0.0"}
+
+
+@dataclass
+class MirrorStats:
+    """镜像的延迟与错误统计"""
+
+    url: str
+    latency: float | None = None
+    """请求耗时的指数加权移动平均(秒)"""
+    error_rate: float = 0.0
+    """错误率的指数加权移动平均"""
+    failures: int = 0
+    """连续失败次数"""
+    open_until: float = 0.0
+    """熔断结束时间"""
+
+    def available(self, now: float) -> bool:
+        """是否未处于熔断状态"""
+        return now >= self.open_until
+
+    def score(self) -> float:
+        """综合得分，越小越优先"""
+        # 未测量过的镜像给予一个中等的默认延迟，使其有机会被探测
+        latency = 1.0 if self.latency is None else self.latency
+        return latency * (1 + 4 * self.error_rate)
+
+    def record_success(self, latency: float | None):
+        """记录成功的请求，latency为None时不计入延迟(如安装包下载)"""
+        alpha = MIRROR_EWMA_ALPHA
+        if latency is None:
+            pass
+        elif self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = alpha * latency + (1 - alpha) * self.latency
+        self.error_rate *= 1 - alpha
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_slow(self, elapsed: float):
+        """请求被对冲取消时，以已等待时间作为延迟的下界"""
+        if self.latency is None or elapsed > self.latency:
+            alpha = MIRROR_EWMA_ALPHA
+            self.latency = (
+                elapsed
+                if self.latency is None
+                else alpha * elapsed + (1 - alpha) * self.latency
+            )
+
+    def record_failure(self):
+        alpha = MIRROR_EWMA_ALPHA
+        self.error_rate = alpha + (1 - alpha) * self.error_rate
+        self.failures += 1
+        if self.failures >= MIRROR_FAILURE_THRESHOLD:
+            # 熔断期结束后允许一次试探请求，失败则再次熔断
+            self.open_until = time.monotonic() + MIRROR_COOLDOWN
+            logger.warning(
+                f"镜像 {self.url} 连续失败 {self.failures} 次，"
+                f"暂停使用 {MIRROR_COOLDOWN}s",
+                LOG_COMMAND,
+            )
+
+
+class MirrorManager:
+    """simple索引镜像管理，按延迟与错误率排序并对请求进行对冲"""
+
+    stats: dict[str, MirrorStats] = {}
+    pip_index_url: str | None = None
+
+    @classmethod
+    async def get_mirrors(cls) -> list[str]:
+        """获取镜像列表，未配置时使用pip的索引地址与pypi官方源"""
+        if mirrors := get_config("MIRRORS", []):
+            return [m if m.endswith("/") else f"{m}/" for m in mirrors]
+        if cls.pip_index_url is None:
+            index_url = await get_pip_index_url()
+            if "pypi.tuna.tsinghua.edu.cn" in index_url:
+                logger.warning(
+                    "为避免清华pip的403错误，已自动切换为阿里云镜像。"
+                    "请及时更换镜像源配置",
+                    LOG_COMMAND,
+                )
+                index_url = "https://mirrors.aliyun.com/pypi/simple/"
+            if not index_url.endswith("/"):
+                index_url += "/"
+            cls.pip_index_url = index_url
+        return list(dict.fromkeys([cls.pip_index_url, PYPI_SIMPLE_URL]))
+
+    @classmethod
+    def ranked(cls, mirrors: list[str]) -> list[str]:
+        """按得分排序镜像并跳过熔断中的镜像，全部熔断时才使用熔断中的镜像"""
+        now = time.monotonic()
+        for mirror in mirrors:
+            cls.stats.setdefault(mirror, MirrorStats(mirror))
+        healthy = [m for m in mirrors if cls.stats[m].available(now)]
+        return sorted(healthy or mirrors, key=lambda m: cls.stats[m].score())
+
+    @classmethod
+    async def _timed(
+        cls, mirror: str, fetch: Callable[[str], Awaitable[T]], timed: bool
+    ) -> T:
+        stats = cls.stats[mirror]
+        start = time.perf_counter()
+        try:
+            result = await fetch(mirror)
+        except asyncio.CancelledError:
+            if timed:
+                stats.record_slow(time.perf_counter() - start)
+            raise
+        except Exception:
+            stats.record_failure()
+            raise
+        stats.record_success(time.perf_counter() - start if timed else None)
+        return result
+
+    @classmethod
+    async def hedged(
+        cls,
+        fetch: Callable[[str], Awaitable[T | None]],
+        delay: float,
+        timed: bool = True,
+    ) -> T | None:
+        """
+        按镜像优先级发起对冲请求
+
+        先向最优镜像发起请求，超过 delay 秒未完成或请求失败时向下一个镜像发起请求，
+        采用最先返回的有效结果并取消其余请求
+
+        参数:
+            :fetch Callable: 以镜像地址为参数的请求函数，返回None表示该镜像无结果
+            :delay float: 对冲延迟(秒)
+            :timed bool: 是否将耗时计入镜像延迟，安装包下载耗时取决于文件大小，不计入
+
+        返回:
+            :T | None: 请求结果，全部镜像均无结果时返回None
+
+        异常:
+            :Exception: 全部镜像均请求失败时抛出最后一个异常
+        """
+        mirrors = iter(cls.ranked(await cls.get_mirrors()))
+        pending: dict[asyncio.Task, str] = {}
+        error: Exception | None = None
+        answered = False
+
+        def launch() -> bool:
+            if (mirror := next(mirrors, None)) is None:
+                return False
+            pending[asyncio.create_task(cls._timed(mirror, fetch, timed))] = mirror
+            return True
+
+        launch()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if launch():
+                        logger.debug("镜像响应缓慢，发起对冲请求", LOG_COMMAND)
+                    continue
+                for task in done:
+                    mirror = pending.pop(task)
+                    if exc := task.exception():
+                        logger.debug(f"镜像 {mirror} 请求失败: {exc}", LOG_COMMAND)
+                        error = exc  # type: ignore
+                    else:
+                        answered = True
+                        if (result := task.result()) is not None:
+                            return result
+                    # 失败或无结果时立即请求下一个镜像，不等待其余请求超时
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        if error and not answered:
+            raise error
+        return None
+
+
+async def fetch_simple_page(mirror: str, package: str) -> tuple[str, str] | None:
+    """获取包的simple索引页面
+
+    返回:
+        tuple[str, str] | None: 页面地址, 页面内容；包不存在时返回None
+    """
+    url = get_simple_url(mirror, package)
+
+    async def fetch() -> bytes | None:
+        response = await StoreHttp.get(url, "index", headers=SIMPLE_HEADERS)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    data = await SharedCache.get_or_fetch("simple", url, SIMPLE_CACHE_TTL, fetch)
+    return None if data is None else (url, data.decode("utf-8", errors="ignore"))
+
+
+async def resolve_whl(
+    package: str, version: str | None = None
+) -> tuple[str, bool] | None:
+    """从最快的镜像解析whl文件
+
+    参数:
+        :package str: 包名
+        :version str | None: 指定版本，为空时获取最新版本
+
+    返回:
+        :tuple[str, bool] | None: 下载地址, 是否提供了元数据文件
+    """
+
+    async def fetch(mirror: str) -> tuple[str, bool] | None:
+        if page := await fetch_simple_page(mirror, package):
+            return select_whl_link(page[1], page[0], version)
+        return None
+
+    return await MirrorManager.hedged(fetch, get_config("MIRROR_HEDGE_DELAY", 1.0))
+
+
+async def download_whl(
+    package: str,
+    version: str | None = None,
+    progress: Callable[[int, int | None], Awaitable[None]] | None = None,
+) -> tuple[str, bytes] | None:
+    """从最快的镜像下载whl文件，镜像过慢时向其他镜像发起对冲下载
+
+    参数:
+        :package str: 包名
+        :version str | None: 指定版本，为空时下载最新版本
+        :progress Callable | None: 下载进度回调
+
+    返回:
+        :tuple[str, bytes] | None: 下载地址, 文件内容
+    """
+
+    filename: str | None = None
+
+    async def fetch(mirror: str) -> tuple[str, bytes] | None:
+        page = await fetch_simple_page(mirror, package)
+        if not page:
+            return None
+        if filename:
+            # 只接受已解析的文件，落后的镜像不能以旧版本的内容写入该文件名的缓存
+            url = find_whl_url(page[1], page[0], filename)
+        else:
+            url = select_whl_url(page[1], page[0], version)
+        if not url:
+            return None
+        return url, await StoreHttp.download(url, "wheel", progress)
+
+    delay = get_config("WHEEL_HEDGE_DELAY", 5.0)
+    if SharedCache.get_root() is None:
+        return await MirrorManager.hedged(fetch, delay, timed=False)
+    # 先解析文件名再查共享缓存，缓存锁包住整个对冲下载，
+    # 而不是在每个镜像的请求中加锁，否则对冲请求会等待首个镜像的锁
+    if not (resolved := await resolve_whl(package, version)):
+        return None
+    filename = get_whl_filename(resolved[0])
+    result: tuple[str, bytes] | None = None
+
+    async def download() -> bytes | None:
+        nonlocal result
+        result = await MirrorManager.hedged(fetch, delay, timed=False)
+        return result[1] if result else None
+
+    # 同名的whl文件内容不会变化，无需过期，长期未使用时清理
+    data = await SharedCache.get_or_fetch("wheels", filename, None, download)
+    await SharedCache.evict("wheels", WHEEL_CACHE_MAX_AGE, WHEEL_CACHE_EVICT_INTERVAL)
+    if data is None:
+        return None
+    return result or (resolved[0], data)
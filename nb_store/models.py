@@ -37,3 +37,24 @@ class StorePluginInfo(BaseModel):
 
     def to_dict(self, **kwargs):
         return model_dump(self, **kwargs)
+
+
+class PluginFilter(BaseModel):
+    """插件列表筛选条件"""
+
+    tags: list[str] = []
+    """标签名称，需同时包含全部标签"""
+    official: bool = False
+    """仅官方插件"""
+    valid: bool = False
+    """仅通过商店测试的插件"""
+    author: str | None = None
+    """作者"""
+    installed: bool | None = None
+    """是否已安装，为空时不筛选"""
+    outdated: bool = False
+    """仅可更新的插件"""
+    since: datetime | None = None
+    """更新时间下限(含)"""
+    until: datetime | None = None
+    """更新时间上限(不含)"""
@@ -0,0 +1,170 @@
+import asyncio
+from dataclasses import dataclass, field
+from importlib.metadata import PackageNotFoundError
+from importlib.metadata import version as dist_version
+
+from packaging.requirements import Requirement
+
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, get_config
+from .http_client import StoreHttp
+from .mirror import resolve_whl
+from .models import StorePluginInfo
+from .utils import parse_requires_dist
+
+
+@dataclass
+class PlanItem:
+    """单个插件的更新计划"""
+
+    plugin_info: StorePluginInfo
+    local_ver: str
+    url: str | None = None
+    size: int | None = None
+    """安装包大小(字节)，未知时为None"""
+    dependencies: list[str] | None = None
+    """依赖列表，镜像未提供元数据时为None"""
+    error: str | None = None
+
+
+@dataclass
+class DependencyChange:
+    """依赖变化"""
+
+    new: dict[str, str] = field(default_factory=dict)
+    """未安装的依赖 包名: 需求"""
+    changed: dict[str, str] = field(default_factory=dict)
+    """版本不满足的依赖 包名: 说明"""
+
+
+async def fetch_size(url: str) -> int | None:
+    """通过HEAD请求获取文件大小"""
+    response = await StoreHttp.head(url, "index")
+    if length := response.headers.get("Content-Length"):
+        return int(length)
+    return None
+
+
+async def fetch_dependencies(url: str) -> list[str]:
+    """读取 PEP 658 元数据文件中的依赖，无需下载安装包"""
+    response = await StoreHttp.get(f"{url.split('#', 1)[0]}.metadata", "index")
+    response.raise_for_status()
+    return parse_requires_dist(response.text)
+
+
+async def plan_plugin(plugin_info: StorePluginInfo, local_ver: str) -> PlanItem:
+    """解析单个插件的更新计划"""
+    item = PlanItem(plugin_info, local_ver)
+    try:
+        resolved = await resolve_whl(plugin_info.project_link)
+    except Exception as e:
+        item.error = str(e) or type(e).__name__
+        return item
+    if not resolved:
+        item.error = "未找到安装包"
+        return item
+    item.url, has_metadata = resolved
+    size, dependencies = await asyncio.gather(
+        fetch_size(item.url),
+        fetch_dependencies(item.url) if has_metadata else asyncio.sleep(0),
+        return_exceptions=True,
+    )
+    if isinstance(size, int):
+        item.size = size
+    if isinstance(dependencies, list):
+        item.dependencies = dependencies
+    elif isinstance(dependencies, Exception):
+        logger.debug(
+            f"获取插件 {plugin_info.name} 依赖失败: {dependencies}", LOG_COMMAND
+        )
+    return item
+
+
+def diff_dependencies(items: list[PlanItem]) -> DependencyChange:
+    """对比计划中的依赖与当前环境"""
+    change = DependencyChange()
+    for item in items:
+        for dep in item.dependencies or []:
+            try:
+                req = Requirement(dep)
+            except Exception:
+                continue
+            # 忽略仅在额外功能或其他平台下需要的依赖
+            if req.marker and not req.marker.evaluate({"extra": ""}):
+                continue
+            try:
+                installed = dist_version(req.name)
+            except PackageNotFoundError:
+                change.new[req.name] = dep
+                continue
+            if req.specifier and not req.specifier.contains(
+                installed, prereleases=True
+            ):
+                change.changed[req.name] = f"{installed} -> {req.specifier}"
+    return change
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def format_plan(items: list[PlanItem]) -> str:
+    """生成更新计划文本"""
+    ok = [item for item in items if not item.error]
+    failed = [item for item in items if item.error]
+    lines = [f"--更新计划: {len(items)}个插件可更新--"]
+    for item in ok:
+        size = format_size(item.size) if item.size is not None else "大小未知"
+        lines.append(
+            f"\t- {item.plugin_info.name}: {item.local_ver} -> "
+            f"{item.plugin_info.version} ({size})"
+        )
+    known = [item.size for item in ok if item.size is not None]
+    lines.append(f"* 预计下载: {format_size(sum(known))}")
+    if len(known) < len(ok):
+        lines[-1] += f" ({len(ok) - len(known)}个插件大小未知)"
+    change = diff_dependencies(ok)
+    if change.new:
+        lines.append("* 新增依赖:\n\t- " + "\n\t- ".join(change.new.values()))
+    if change.changed:
+        lines.append(
+            "* 需变更版本的依赖:\n\t- "
+            + "\n\t- ".join(f"{k}: {v}" for k, v in change.changed.items())
+        )
+    if unknown := [item.plugin_info.name for item in ok if item.dependencies is None]:
+        lines.append("* 镜像未提供元数据，依赖未知:\n\t- " + "\n\t- ".join(unknown))
+    if failed:
+        lines.append(
+            "* 无法解析:\n\t- "
+            + "\n\t- ".join(f"{i.plugin_info.name}: {i.error}" for i in failed)
+        )
+    return "\n".join(lines)
+
+
+async def build_update_plan(plugins: list[tuple[StorePluginInfo, str]]) -> str:
+    """
+    并发解析全部插件的更新计划
+
+    参数:
+        :plugins list[tuple[StorePluginInfo, str]]: 插件信息, 本地版本号
+
+    返回:
+        :str: 更新计划
+    """
+    # 每个插件最多同时发起HEAD与元数据两个请求，在此处限流而不是在连接池中排队，
+    # 排队时间不会计入镜像对冲延迟
+    limit = asyncio.Semaphore(
+        max(1, get_config("HTTP_MAX_INDEX_REQUESTS_PER_HOST", 32) // 2)
+    )
+
+    async def plan(plugin_info: StorePluginInfo, local_ver: str) -> PlanItem:
+        async with limit:
+            return await plan_plugin(plugin_info, local_ver)
+
+    items = await asyncio.gather(
+        *(plan(plugin_info, local_ver) for plugin_info, local_ver in plugins)
+    )
+    return format_plan(list(items))
@@ -0,0 +1,279 @@
+import asyncio
+from collections.abc import Iterable, Iterator, Sequence
+import contextlib
+from datetime import datetime
+from pathlib import Path
+import pickle
+import sys
+from typing import Any
+import unicodedata
+
+from zhenxun.services.log import logger
+from zhenxun.utils.image_utils import BuildImage, ImageTemplate
+
+from . import render_worker
+from .config import LOG_COMMAND
+from .render_worker import row_style
+
+WORKER_SCRIPT = Path(render_worker.__file__)
+"""渲染子进程脚本"""
+
+RENDER_MODES = ("image", "text", "markdown")
+"""可选的列表输出模式"""
+
+CELL_MAX_WIDTH = 30
+"""文本模式下单元格最大显示宽度"""
+DESC_MAX_WIDTH = 24
+"""文本模式下简介列最大显示宽度"""
+
+
+def char_width(char: str) -> int:
+    """字符显示宽度，全角字符占两格"""
+    return 2 if unicodedata.east_asian_width(char) in ("F", "W") else 1
+
+
+def text_width(text: str) -> int:
+    """文本显示宽度"""
+    return sum(char_width(c) for c in text)
+
+
+def truncate(text: str, width: int) -> str:
+    """按显示宽度截断文本，超出部分以 … 代替"""
+    if text_width(text) <= width:
+        return text
+    result = []
+    used = 0
+    for char in text:
+        w = char_width(char)
+        if used + w > width - 1:
+            break
+        result.append(char)
+        used += w
+    return "".join(result) + "…"
+
+
+def format_cell(value: Any) -> str:
+    """将单元格数据转换为紧凑文本"""
+    if isinstance(value, bool):
+        return "√" if value else "×"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return " ".join(str(value).split())
+
+
+def _iter_cells(
+    column_name: Sequence[str], data_list: Iterable[Sequence[Any]]
+) -> Iterator[list[str]]:
+    for row in data_list:
+        yield [
+            truncate(
+                format_cell(value),
+                DESC_MAX_WIDTH if column == "简介" else CELL_MAX_WIDTH,
+            )
+            for column, value in zip(column_name, row)
+        ]
+
+
+def iter_text_table(
+    column_name: Sequence[str], data_list: Sequence[Sequence[Any]]
+) -> Iterator[str]:
+    """逐行生成对齐的纯文本表格"""
+    widths = [text_width(c) for c in column_name]
+    for cells in _iter_cells(column_name, data_list):
+        widths = [max(w, text_width(c)) for w, c in zip(widths, cells)]
+
+    def _line(cells: Sequence[str]) -> str:
+        return " ".join(
+            c + " " * (w - text_width(c)) for c, w in zip(cells, widths)
+        ).rstrip()
+
+    yield _line(column_name)
+    for cells in _iter_cells(column_name, data_list):
+        yield _line(cells)
+
+
+def iter_markdown_table(
+    column_name: Sequence[str], data_list: Iterable[Sequence[Any]]
+) -> Iterator[str]:
+    """逐行生成markdown表格"""
+    yield "| " + " | ".join(column_name) + " |"
+    yield "|" + "---|" * len(column_name)
+    for cells in _iter_cells(column_name, data_list):
+        yield "| " + " | ".join(c.replace("|", "\\|") for c in cells) + " |"
+
+
+def render_text(
+    title: str,
+    tip: str,
+    column_name: Sequence[str],
+    data_list: Sequence[Sequence[Any]],
+    markdown: bool = False,
+) -> str:
+    """
+    将表格渲染为文本
+
+    参数:
+        :title str: 标题
+        :tip str: 提示
+        :column_name Sequence[str]: 表头
+        :data_list Sequence[Sequence[Any]]: 行数据
+        :markdown bool: 是否输出markdown表格
+
+    返回:
+        :str: 渲染结果
+    """
+    if markdown:
+        lines = [f"## {title}", "", *iter_markdown_table(column_name, data_list)]
+        lines += ["", f"> {tip}"]
+    else:
+        lines = [title, *iter_text_table(column_name, data_list), tip]
+    return "\n".join(lines)
+
+
+class RenderError(RuntimeError):
+    """子进程内渲染出错，子进程本身仍可继续使用"""
+
+
+class RenderWorker:
+    """独立的渲染子进程
+
+    以脚本方式启动而非 multiprocessing，子进程不会重新执行bot入口或导入本包
+    """
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+
+    @classmethod
+    async def spawn(cls) -> "RenderWorker":
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            str(WORKER_SCRIPT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        worker = cls(process)
+        try:
+            await worker.call("init", list(sys.path))
+        except BaseException:
+            worker.kill()
+            raise
+        return worker
+
+    async def call(self, command: str, *args: Any) -> Any:
+        """发送命令并等待结果，中途取消会使消息流错位，调用方需丢弃该进程"""
+        assert self.process.stdin and self.process.stdout
+        data = pickle.dumps((command, *args))
+        self.process.stdin.write(render_worker.HEADER.pack(len(data)) + data)
+        await self.process.stdin.drain()
+        header = await self.process.stdout.readexactly(render_worker.HEADER.size)
+        (size,) = render_worker.HEADER.unpack(header)
+        ok, result = pickle.loads(await self.process.stdout.readexactly(size))
+        if not ok:
+            raise RenderError(result)
+        return result
+
+    def kill(self):
+        with contextlib.suppress(ProcessLookupError):
+            self.process.kill()
+
+
+class RenderPool:
+    """表格图片渲染子进程池"""
+
+    workers: list[RenderWorker] = []
+    idle: asyncio.Queue[RenderWorker | None] | None = None
+    start_task: asyncio.Task | None = None
+
+    @classmethod
+    async def start(cls, workers: int):
+        """在后台启动渲染子进程，启动完成前及失败时在当前进程内渲染
+
+        参数:
+            workers: 进程数，小于等于0时不启用子进程
+        """
+        if cls.start_task or workers <= 0:
+            return
+        cls.start_task = asyncio.create_task(cls._start(workers))
+
+    @classmethod
+    async def _start(cls, workers: int):
+        results = await asyncio.gather(
+            *(RenderWorker.spawn() for _ in range(workers)), return_exceptions=True
+        )
+        started = [r for r in results if isinstance(r, RenderWorker)]
+        if errors := [r for r in results if isinstance(r, BaseException)]:
+            logger.warning(
+                "渲染子进程启动失败，将在当前进程内渲染", LOG_COMMAND, e=errors[0]
+            )
+        if not started:
+            return
+        cls.idle = asyncio.Queue()
+        for worker in started:
+            cls.idle.put_nowait(worker)
+        cls.workers = started
+        logger.info(f"渲染子进程已启动, 进程数: {len(started)}", LOG_COMMAND)
+
+    @classmethod
+    def discard(cls, worker: RenderWorker):
+        """结束异常的子进程，全部结束后唤醒等待者回退为进程内渲染"""
+        worker.kill()
+        if worker in cls.workers:
+            cls.workers.remove(worker)
+        if not cls.workers and cls.idle:
+            cls.idle.put_nowait(None)
+
+    @classmethod
+    def shutdown(cls):
+        """结束全部子进程"""
+        if cls.start_task and not cls.start_task.done():
+            cls.start_task.cancel()
+        for worker in cls.workers:
+            worker.kill()
+        cls.workers = []
+        cls.idle = None
+
+    @classmethod
+    async def table_page(
+        cls,
+        title: str,
+        tip: str,
+        column_name: list[str],
+        data_list: list[list[Any]],
+    ) -> BuildImage | bytes:
+        """渲染表格图片
+
+        参数:
+            title: 标题
+            tip: 提示
+            column_name: 表头
+            data_list: 行数据
+
+        返回:
+            BuildImage | bytes: 子进程渲染时为图片数据，否则为BuildImage
+        """
+        if cls.workers and cls.idle:
+            idle = cls.idle
+            worker = await idle.get()
+            if worker is None:
+                idle.put_nowait(None)
+            else:
+                rows = [[str(value) for value in row] for row in data_list]
+                try:
+                    result = await worker.call(
+                        "render_table", title, tip, column_name, rows
+                    )
+                except RenderError as e:
+                    idle.put_nowait(worker)
+                    logger.warning("子进程渲染失败，回退为进程内渲染", LOG_COMMAND, e=e)
+                except BaseException as e:
+                    # 子进程崩溃或请求被取消后消息流不再可靠，不再使用该进程
+                    cls.discard(worker)
+                    if not isinstance(e, Exception):
+                        raise
+                    logger.warning("子进程渲染失败，回退为进程内渲染", LOG_COMMAND, e=e)
+                else:
+                    idle.put_nowait(worker)
+                    return result
+        return await ImageTemplate.table_page(
+            title, tip, column_name, data_list, text_style=row_style
+        )
@@ -0,0 +1,96 @@
+"""渲染子进程
+
+以 `python render_worker.py` 的方式作为独立进程运行，不导入 nb_store 包与bot入口，
+通过标准输入输出交换以4字节长度为前缀的pickle消息:
+请求为 (命令, *参数)，响应为 (是否成功, 结果或错误说明)
+"""
+
+import asyncio
+import os
+import pickle
+import struct
+import sys
+import traceback
+from typing import Any, BinaryIO
+
+HEADER = struct.Struct(">I")
+
+
+def row_style(column: str, text: str):
+    """文本风格
+
+    参数:
+        column: 表头
+        text: 文本内容
+
+    返回:
+        RowStyle: RowStyle
+    """
+    # 子进程在收到父进程的 sys.path 后才能导入真寻
+    from zhenxun.utils.image_utils import RowStyle
+
+    style = RowStyle()
+    if column == "-" and text == "已安装":
+        style.font_color = "#67C23A"
+    if column == "商店测试":
+        style.font_color = "#67C23A" if text == "True" else "#F56C6C"
+    return style
+
+
+def init(sys_path: list[str]) -> bool:
+    """使用父进程的 sys.path 并预先导入渲染依赖"""
+    sys.path[:] = sys_path
+    import zhenxun.utils.image_utils  # noqa: F401
+
+    return True
+
+
+def render_table(
+    title: str,
+    tip: str,
+    column_name: list[str],
+    data_list: list[list[str]],
+) -> bytes:
+    """渲染表格图片并返回编码后的图片数据"""
+    from zhenxun.utils.image_utils import ImageTemplate
+
+    image = asyncio.run(
+        ImageTemplate.table_page(
+            title, tip, column_name, data_list, text_style=row_style
+        )
+    )
+    return image.pic2bytes()
+
+
+COMMANDS = {"init": init, "render_table": render_table}
+
+
+def read_message(stream: BinaryIO) -> Any:
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    return pickle.loads(stream.read(HEADER.unpack(header)[0]))
+
+
+def write_message(stream: BinaryIO, message: Any):
+    data = pickle.dumps(message)
+    stream.write(HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def main():
+    # 协议独占原标准输出，其余输出一律转到标准错误，避免污染消息流
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    while (request := read_message(sys.stdin.buffer)) is not None:
+        command, *args = request
+        try:
+            response = (True, COMMANDS[command](*args))
+        except Exception:
+            response = (False, traceback.format_exc())
+        write_message(output, response)
+
+
+if __name__ == "__main__":
+    main()
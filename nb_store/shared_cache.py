@@ -0,0 +1,158 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+import contextlib
+import hashlib
+import os
+from pathlib import Path
+import re
+import time
+
+from nonebot.utils import run_sync
+
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, SHARED_CACHE_LOCK_TIMEOUT, get_config
+
+UNSAFE_PATTERN = re.compile(r"[^\w.-]")
+
+
+def cache_filename(key: str) -> str:
+    """将缓存键转换为安全的文件名"""
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    name = UNSAFE_PATTERN.sub("_", key)[-80:]
+    return f"{name}-{digest}"
+
+
+@run_sync
+def read_fresh(path: Path, ttl: float | None) -> bytes | None:
+    """读取未过期的缓存，ttl为空时永不过期，此时以修改时间记录最近使用时间"""
+    try:
+        if ttl is not None and time.time() - path.stat().st_mtime > ttl:
+            return None
+        data = path.read_bytes()
+        if ttl is None:
+            with contextlib.suppress(OSError):
+                os.utime(path)
+        return data
+    except FileNotFoundError:
+        return None
+
+
+@run_sync
+def evict_unused(directory: Path, max_age: float) -> int:
+    """删除超过 max_age 秒未被使用的缓存文件，返回删除数量"""
+    removed = 0
+    if not directory.exists():
+        return removed
+    now = time.time()
+    for path in directory.iterdir():
+        # 锁文件与临时文件由各自的持有者清理
+        if not path.is_file() or path.name.startswith(".") or path.suffix == ".lock":
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            if now - path.stat().st_mtime > max_age:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+@run_sync
+def atomic_write(path: Path, data: bytes):
+    """先写入临时文件再重命名，其他进程不会读到写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def try_lock(lock: Path) -> bool:
+    """尝试创建锁文件，超时未释放的锁视为持有者已退出
+
+    直接在事件循环中执行，不放入线程：协程在创建锁文件期间被取消时，
+    线程中创建的锁将无人释放
+    """
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        with contextlib.suppress(FileNotFoundError):
+            if time.time() - lock.stat().st_mtime > SHARED_CACHE_LOCK_TIMEOUT:
+                lock.unlink()
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(str(os.getpid()))
+    return True
+
+
+@contextlib.asynccontextmanager
+async def file_lock(lock: Path) -> AsyncIterator[None]:
+    """跨进程文件锁"""
+    while not try_lock(lock):
+        await asyncio.sleep(0.2)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            lock.unlink()
+
+
+class SharedCache:
+    """多个bot实例共享的缓存目录
+
+    同一条目同一时间只由一个实例刷新，其余实例等待并复用其结果
+    """
+
+    last_evict: dict[str, float] = {}
+
+    @classmethod
+    def get_root(cls) -> Path | None:
+        """共享缓存目录，未配置时为None"""
+        path = get_config("SHARED_CACHE_PATH", "")
+        return Path(path) if path else None
+
+    @classmethod
+    async def get_or_fetch(
+        cls,
+        namespace: str,
+        key: str,
+        ttl: float | None,
+        fetch: Callable[[], Awaitable[bytes | None]],
+    ) -> bytes | None:
+        """
+        读取共享缓存，不存在或已过期时调用 fetch 获取并写入
+
+        参数:
+            :namespace str: 缓存分类
+            :key str: 缓存键
+            :ttl float | None: 有效期(秒)，为空时永不过期
+            :fetch Callable: 获取数据的函数，返回None时不写入缓存
+
+        返回:
+            :bytes | None: 数据
+        """
+        root = cls.get_root()
+        if root is None:
+            return await fetch()
+        path = root / namespace / cache_filename(key)
+        if (data := await read_fresh(path, ttl)) is not None:
+            return data
+        async with file_lock(path.with_name(f"{path.name}.lock")):
+            # 等待锁期间其他实例可能已经刷新了该条目
+            if (data := await read_fresh(path, ttl)) is not None:
+                logger.debug(f"复用其他实例的缓存 {namespace}/{key}", LOG_COMMAND)
+                return data
+            data = await fetch()
+            if data is not None:
+                await atomic_write(path, data)
+            return data
+
+    @classmethod
+    async def evict(cls, namespace: str, max_age: float, interval: float):
+        """清理长期未使用的永不过期条目，同一分类每 interval 秒最多清理一次"""
+        root = cls.get_root()
+        now = time.monotonic()
+        if root is None or now - cls.last_evict.get(namespace, -interval) < interval:
+            return
+        cls.last_evict[namespace] = now
+        if removed := await evict_unused(root / namespace, max_age):
+            logger.debug(f"已清理共享缓存 {namespace} {removed} 个文件", LOG_COMMAND)
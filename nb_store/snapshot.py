@@ -0,0 +1,143 @@
+import os
+from pathlib import Path
+import shutil
+import time
+
+from nonebot.utils import run_sync
+import ujson
+
+from zhenxun.services.log import logger
+
+from .config import LOG_COMMAND, PLUGIN_FLODER
+from .utils import DATA_PATH
+
+SNAPSHOT_PATH = DATA_PATH / "snapshots"
+
+
+@run_sync
+def link_tree(src: Path, dst: Path) -> bool:
+    """
+    以硬链接复制目录，文件系统不支持时退化为复制
+
+    返回:
+        :bool: 是否全部使用硬链接
+    """
+    linked = True
+    for path in src.rglob("*"):
+        if "__pycache__" in path.parts or not path.is_file():
+            continue
+        target = dst / path.relative_to(src)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            linked = False
+            shutil.copy2(path, target)
+    return linked
+
+
+def list_snapshots(module_name: str) -> list[Path]:
+    """获取插件的快照目录，按时间从新到旧排列"""
+    root = SNAPSHOT_PATH / module_name
+    if not root.exists():
+        return []
+    # 没有快照信息的目录是被中断的快照，不能用于回滚
+    return sorted(
+        (p for p in root.iterdir() if p.is_dir() and p.with_suffix(".json").exists()),
+        key=lambda p: int(p.name),
+        reverse=True,
+    )
+
+
+def read_meta(snapshot: Path) -> dict:
+    """读取快照信息"""
+    meta = snapshot.with_suffix(".json")
+    return ujson.loads(meta.read_text(encoding="utf-8")) if meta.exists() else {}
+
+
+@run_sync
+def prune_snapshots(module_name: str, retention: int):
+    """仅保留最近的 retention 个快照，并清理被中断的快照"""
+    for snapshot in list_snapshots(module_name)[retention:]:
+        shutil.rmtree(snapshot, ignore_errors=True)
+        snapshot.with_suffix(".json").unlink(missing_ok=True)
+    root = SNAPSHOT_PATH / module_name
+    for path in root.iterdir() if root.exists() else []:
+        if path.is_dir() and not path.with_suffix(".json").exists():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+async def take_snapshot(
+    module_name: str,
+    version: str | None,
+    retention: int,
+    record: dict | None = None,
+) -> Path | None:
+    """
+    为插件目录创建快照
+
+    参数:
+        :module_name str: 插件模块名
+        :version str | None: 当前本地版本号
+        :retention int: 保留的快照数量
+        :record dict | None: 当前的安装记录，回滚时一并恢复
+
+    返回:
+        :Path | None: 快照目录，插件目录不存在或没有文件时为None
+    """
+    src = PLUGIN_FLODER / module_name
+    if retention <= 0 or not src.exists():
+        return None
+    dst = SNAPSHOT_PATH / module_name / str(time.time_ns())
+    start = time.perf_counter()
+    try:
+        linked = await link_tree(src, dst)
+        if not dst.exists():
+            # 例如中断的安装留下的空目录，没有可恢复的内容
+            logger.debug(f"插件 {module_name} 目录中没有文件，跳过快照", LOG_COMMAND)
+            return None
+        dst.with_suffix(".json").write_text(
+            ujson.dumps({"version": version, "time": time.time(), "record": record}),
+            encoding="utf-8",
+        )
+    except BaseException:
+        # 任务被取消或复制失败时不留下不完整的快照
+        shutil.rmtree(dst, ignore_errors=True)
+        raise
+    logger.debug(
+        f"插件 {module_name} 快照已创建: {dst}, 硬链接: {linked}, "
+        f"耗时 {time.perf_counter() - start:.3f}s",
+        LOG_COMMAND,
+    )
+    await prune_snapshots(module_name, retention)
+    return dst
+
+
+@run_sync
+def restore_snapshot(module_name: str) -> dict | None:
+    """
+    将插件目录恢复为最近一次快照，恢复后该快照被移除
+
+    返回:
+        :dict | None: 快照信息，没有快照时为None
+    """
+    snapshots = list_snapshots(module_name)
+    if not snapshots:
+        return None
+    snapshot = snapshots[0]
+    meta = read_meta(snapshot)
+    target = PLUGIN_FLODER / module_name
+    trash = target.with_name(f".{module_name}.rollback")
+    shutil.rmtree(trash, ignore_errors=True)
+    if target.exists():
+        target.rename(trash)
+    try:
+        # 同一文件系统下为目录重命名，否则退化为移动
+        shutil.move(snapshot, target)
+    except Exception:
+        if trash.exists():
+            trash.rename(target)
+        raise
+    shutil.rmtree(trash, ignore_errors=True)
+    snapshot.with_suffix(".json").unlink(missing_ok=True)
+    return meta
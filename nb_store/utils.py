@@ -1,26 +1,31 @@
 import asyncio
+from collections.abc import Awaitable, Callable
+import compileall
 import contextlib
 import csv
 import html.parser
+import importlib
 import io
 from pathlib import Path
 import shutil
 import subprocess
 import sys
-from urllib.parse import urljoin
+import time
+from urllib.parse import unquote, urljoin, urlparse
 import zipfile
 
 import aiofiles
+import nonebot
 from nonebot.utils import run_sync
 from packaging.requirements import Requirement
+from packaging.version import InvalidVersion, Version
 from packaging.version import parse as parse_version
 import ujson
 
 from zhenxun.configs.path_config import DATA_PATH as BASE_PATH
 from zhenxun.services.log import logger
-from zhenxun.utils.http_utils import AsyncHttpx
 
-from .config import LOG_COMMAND
+from .config import LOG_COMMAND, PLUGIN_FLODER, PYPI_SIMPLE_URL
 from .models import StorePluginInfo
 
 DATA_PATH = BASE_PATH / "nb_store"
@@ -36,13 +41,21 @@ class SimpleIndexParser(html.parser.HTMLParser):
     def __init__(self):
         super().__init__()
         self.links = []
+        self.metadata_links: set[str] = set()
+        """提供了 PEP 658 元数据文件的链接"""
         self._current_href = None
         self._current_tag = None
 
     def handle_starttag(self, tag, attrs):
         self._current_tag = tag
         if tag == "a":
-            self._current_href = dict(attrs).get("href")
+            attrs = dict(attrs)
+            self._current_href = attrs.get("href")
+            metadata = attrs.get("data-core-metadata") or attrs.get(
+                "data-dist-info-metadata"
+            )
+            if self._current_href and metadata and metadata != "false":
+                self.metadata_links.add(self._current_href)
 
     def handle_data(self, data):
         if data.lower().endswith(".whl") and (
@@ -104,8 +117,8 @@ def path_rm(path: Path) -> None:
         return
 
 
-async def get_record_files(zf: zipfile.ZipFile):
-    """从RECORD文件中获取包文件列表"""
+async def get_record_rows(zf: zipfile.ZipFile) -> list[list[str]]:
+    """从RECORD文件中获取包文件记录"""
     namelist = await zip_namelist(zf)
     record_file = next(
         (
@@ -118,15 +131,25 @@ async def get_record_files(zf: zipfile.ZipFile):
     if not record_file:
         raise FileNotFoundError("找不到RECORD文件")
     record_data = await zip_read(zf, record_file)
-    records: list[str] = []
+    records: list[list[str]] = []
     for line in record_data.decode("utf-8").splitlines():
         reader = csv.reader([line])
         """CSV结构: path, hash, size"""
         if row := next(reader):
-            records.append(row[0])
+            records.append(row)
     return records
 
 
+async def get_record_files(zf: zipfile.ZipFile):
+    """从RECORD文件中获取包文件列表"""
+    return [row[0] for row in await get_record_rows(zf)]
+
+
+def is_code_file(name: str) -> bool:
+    """是否为需要解压到插件目录的代码文件"""
+    return not (".dist-info/" in name or ".data/" in name or name.endswith("/"))
+
+
 async def get_dependencies_from_metadata(zf: zipfile.ZipFile) -> list[str]:
     """从METADATA文件中获取依赖列表（并在依赖层面检查冲突）"""
     namelist = await zip_namelist(zf)
@@ -137,7 +160,11 @@ async def get_dependencies_from_metadata(zf: zipfile.ZipFile) -> list[str]:
     if not metadata_file:
         return []
     data = await zip_read(zf, metadata_file)
-    decoded_data = data.decode("utf-8", errors="ignore")
+    return parse_requires_dist(data.decode("utf-8", errors="ignore"))
+
+
+def parse_requires_dist(decoded_data: str) -> list[str]:
+    """从METADATA内容中解析依赖列表"""
     dependencies: list[str] = []
     prefix = "Requires-Dist:"
     prefix_len = len(prefix)
@@ -164,20 +191,22 @@ async def get_dependencies_from_metadata(zf: zipfile.ZipFile) -> list[str]:
     return dependencies
 
 
-async def extract_code_from_whl(zf: zipfile.ZipFile, dest_dir: Path):
+async def extract_code_from_whl(
+    zf: zipfile.ZipFile,
+    dest_dir: Path,
+    progress: Callable[[int, int], Awaitable[None]] | None = None,
+):
     """从WHL文件中提取代码文件"""
     records = await get_record_files(zf)
-    code_files = [
-        f
-        for f in records
-        if not (".dist-info/" in f or ".data/" in f or f.endswith("/"))
-    ]
-    for file in code_files:
+    code_files = [f for f in records if is_code_file(f)]
+    for i, file in enumerate(code_files, 1):
         data = await zip_read(zf, file)
         dest_path = dest_dir / file
         path_mkdir(dest_path.parent)
         async with aiofiles.open(dest_path, "wb") as f:
             await f.write(data)
+        if progress:
+            await progress(i, len(code_files))
 
 
 async def get_pip_index_url() -> str:
@@ -205,44 +234,77 @@ async def get_pip_index_url() -> str:
         for line in result.stdout.splitlines():
             if "index-url" in line:
                 return line.split("=", 1)[-1].strip()
-    return "https://pypi.org/simple/"
+    return PYPI_SIMPLE_URL
 
 
-async def get_latest_whl_url_from_simple(package: str, index_url: str) -> str | None:
-    """从索引地址中获取最新的whl文件的下载地址"""
+def get_simple_url(index_url: str, package: str) -> str:
+    """获取包在simple索引中的页面地址"""
     if not index_url.endswith("/"):
         index_url += "/"
     url = urljoin(index_url, package.replace("_", "-").lower())
     if not url.endswith("/"):
         url += "/"
-    html = await AsyncHttpx.get(url, timeout=10, headers={"User-Agent": "pip/25.0.0"})
-    parser = SimpleIndexParser()
-    parser.feed(html.text)
-    whl_links = parser.links
-    if not whl_links:
+    return url
+
+
+def get_whl_filename(link: str) -> str:
+    """从下载链接中获取whl文件名"""
+    return unquote(urlparse(link).path.rsplit("/", 1)[-1])
+
+
+def get_whl_version(link: str) -> Version | None:
+    """从下载链接中解析whl文件的版本号"""
+    parts = get_whl_filename(link).split("-")
+    if len(parts) < 2:
+        return None
+    try:
+        return parse_version(parts[1])
+    except InvalidVersion:
         return None
-    whl_links.sort(key=lambda link: parse_version(link.split("-")[1]), reverse=True)
-    return urljoin(url, whl_links[0]) if whl_links else None
 
 
-async def get_whl_download_url(package: str) -> str | None:
-    """获取whl文件的下载地址
+def select_whl_link(
+    html: str, page_url: str, version: str | None = None
+) -> tuple[str, bool] | None:
+    """
+    从simple索引页面中选择whl文件
 
     参数:
-        :package str: 包名
+        :html str: 索引页面内容
+        :page_url str: 索引页面地址，用于拼接相对链接
+        :version str | None: 指定版本，为空时选择最新版本
 
     返回:
-        :str: 下载地址
+        :tuple[str, bool] | None: 下载地址, 是否提供了元数据文件
     """
+    parser = SimpleIndexParser()
+    parser.feed(html)
+    versions = [(get_whl_version(link), link) for link in parser.links]
+    candidates = [(ver, link) for ver, link in versions if ver is not None]
+    if version is not None:
+        target = parse_version(version)
+        candidates = [(ver, link) for ver, link in candidates if ver == target]
+    if not candidates:
+        return None
+    _, link = max(candidates, key=lambda x: x[0])
+    return urljoin(page_url, link), link in parser.metadata_links
 
-    index_url = await get_pip_index_url()
-    if "pypi.tuna.tsinghua.edu.cn" in index_url:
-        logger.warning(
-            "为避免清华pip的403错误，已自动切换为阿里云镜像。请及时更换镜像源配置",
-            LOG_COMMAND,
-        )
-        index_url = "https://mirrors.aliyun.com/pypi/simple"
-    return await get_latest_whl_url_from_simple(package, index_url)
+
+def select_whl_url(html: str, page_url: str, version: str | None = None) -> str | None:
+    """从simple索引页面中选择whl文件的下载地址"""
+    if result := select_whl_link(html, page_url, version):
+        return result[0]
+    return None
+
+
+def find_whl_url(html: str, page_url: str, filename: str) -> str | None:
+    """从simple索引页面中查找指定文件名的whl文件下载地址"""
+    parser = SimpleIndexParser()
+    parser.feed(html)
+    for link in parser.links:
+        if get_whl_filename(link) == filename:
+            return urljoin(page_url, link)
+    return None
 
 
 @run_sync
@@ -283,7 +345,11 @@ def move_contents_up_one_level(target_dir: Path) -> None:
         target_dir.rmdir()
 
 
-async def copy2(whl_bytes: bytes, target_path: Path) -> None:
+async def copy2(
+    whl_bytes: bytes,
+    target_path: Path,
+    progress: Callable[[int, int], Awaitable[None]] | None = None,
+) -> None:
     """
     将 wheel/zip 内容解压到 target_path，并在 target_path 中写入 requirements.txt
       - 解压文件内容到 target_path
@@ -293,7 +359,7 @@ async def copy2(whl_bytes: bytes, target_path: Path) -> None:
     path_mkdir(target_path)
     zf = await open_zip(whl_bytes)
     try:
-        await extract_code_from_whl(zf, target_path)
+        await extract_code_from_whl(zf, target_path, progress)
         deps = await get_dependencies_from_metadata(zf)
     finally:
         await run_sync(zf.close)()
@@ -312,6 +378,52 @@ async def copy2(whl_bytes: bytes, target_path: Path) -> None:
                 await f.write(dep + "\n")
 
 
+@run_sync
+def compile_plugin(target_path: Path) -> float:
+    """
+    将插件目录预编译为字节码，避免首次启动时逐个编译模块
+
+    参数:
+        :target_path Path: 插件目录
+
+    返回:
+        :float: 编译耗时(秒)
+    """
+    start = time.perf_counter()
+    # 插件目录通常很小，在当前线程内顺序编译即可；多进程编译(workers!=1)在
+    # 非主线程中以fork启动会复制整个bot进程，可能因其他线程持有的锁而死锁
+    # optimize=-1 跟随当前解释器的优化级别
+    success = compileall.compile_dir(target_path, quiet=1, workers=1, optimize=-1)
+    if not success:
+        logger.warning(f"{target_path} 部分文件预编译失败", LOG_COMMAND)
+    return time.perf_counter() - start
+
+
+def hot_load_plugin(module_name: str) -> tuple[bool, str]:
+    """
+    尝试通过nonebot插件加载器立即加载新安装的插件
+
+    参数:
+        :module_name str: 插件模块名
+
+    返回:
+        :tuple[bool, str]: 是否加载成功, 说明
+    """
+    module_path = f"{PLUGIN_FLODER.name}.{module_name}"
+    if module_path in sys.modules or nonebot.get_plugin(module_name):
+        return False, "该插件模块已被导入过"
+    # 新解压的目录可能不在导入系统的缓存中
+    importlib.invalidate_caches()
+    try:
+        plugin = nonebot.load_plugin(PLUGIN_FLODER / module_name)
+    except Exception as e:
+        logger.error(f"热加载插件 {module_name} 失败", LOG_COMMAND, e=e)
+        return False, f"热加载失败 e: {e}"
+    if not plugin:
+        return False, "热加载失败，详情请查看日志"
+    return True, "已热加载"
+
+
 async def init_ver_data():
     global PLUGIN_VER_DATA
     async with PLUGIN_VER_LOCK: